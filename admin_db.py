@@ -1,85 +1,233 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-import streamlit as st
-from functools import lru_cache
-import json
-
-# Initialize Firebase Admin once using secrets
-def initialize_firebase():
-    if not firebase_admin._apps:
-        # Get Firebase service account from secrets
-        firebase_secrets = st.secrets["firebase"]["service_account"]
-        
-        # Convert the secrets to a dictionary for credentials
-        cred_dict = {
-            "type": firebase_secrets["type"],
-            "project_id": firebase_secrets["project_id"],
-            "private_key_id": firebase_secrets["private_key_id"],
-            "private_key": firebase_secrets["private_key"].replace("\\n", "\n"),
-            "client_email": firebase_secrets["client_email"],
-            "client_id": firebase_secrets["client_id"],
-            "auth_uri": firebase_secrets["auth_uri"],
-            "token_uri": firebase_secrets["token_uri"],
-            "auth_provider_x509_cert_url": firebase_secrets["auth_provider_x509_cert_url"],
-            "client_x509_cert_url": firebase_secrets["client_x509_cert_url"]
-        }
-        
-        cred = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(cred)
+import atexit
+import copy
+import threading
+from ttl_cache import TTLCache
+from write_behind import WriteBehindQueue
+from feedback_log import CLEAR, DISLIKE, LEGACY_UNMATCHED, LIKE, coalesce_events, feedback_event, replay
+from preference_store import create_preference_store, merge_fields
+
+# User documents are cached per process; writes made through this module update the cache
+USER_CACHE_SIZE = 100
+USER_CACHE_TTL = 300  # seconds
+
+# Queued feedback writes are coalesced per user and flushed this often
+USER_WRITE_INTERVAL = 2.0  # seconds
+# Store reads retried when a queued write lands mid-read, before giving up on caching
+USER_LOAD_ATTEMPTS = 3
+
+# Feedback is appended as small events per user and folded into the user
+# document once this many have accumulated
+COMPACT_AFTER_EVENTS = 100
+
+# Feedback lists in the user document; writes to them are recorded as events
+FEEDBACK_FIELDS = ('liked_ids', 'disliked_ids')
 
-# Initialize Firebase
-initialize_firebase()
-db = firestore.client()
+# Cached marker for users without a document, so repeat lookups skip the store too
+_NO_DOCUMENT = object()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_preference_store():
+    """The configured PreferenceStore, created on first use (Firebase is only initialized then)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_preference_store()
+    return _store
+
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# Events appended per user since the last snapshot; updated by script threads and the writer
+_events_since_snapshot = {}
+_events_lock = threading.Lock()
+
+def _count_events(user_id, count=None, added=0):
+    """Set (``count``) or adjust (``added``) a user's unfolded event count and return it"""
+    with _events_lock:
+        if count is None:
+            count = max(0, _events_since_snapshot.get(user_id, 0) + added)
+        _events_since_snapshot[user_id] = count
+        return count
 
-# Cache user data for 5 minutes
-@lru_cache(maxsize=100)
 def get_cached_user_data(user_id):
-    try:
-        doc_ref = db.collection('users').document(user_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            return doc.to_dict()
-        return None
-    except Exception as e:
-        print(f"[ERROR] Error getting cached user data: {e}")
+    """Return the user's document (or None), reading the store at most once per TTL"""
+    data = _user_cache.get(user_id)
+    if data is None:
+        for _ in range(USER_LOAD_ATTEMPTS):
+            # A queued write landing between the load and the pending check would be in
+            # neither; the write generation tells us to read again rather than cache that
+            generation = _user_writes.generation(user_id)
+            try:
+                data, replayed = get_preference_store().load(user_id)
+            except Exception as e:
+                print(f"[ERROR] Error getting cached user data: {e}")
+                return None
+            pending = _user_writes.pending(user_id)
+            settled = _user_writes.generation(user_id) == generation
+            if settled:
+                break
+        if _count_events(user_id, count=replayed) >= COMPACT_AFTER_EVENTS:
+            _user_writes.enqueue(user_id, {'compact': True})
+        # Writes still queued for this user are newer than what the store returned
+        if pending:
+            data = _apply_changes({} if data is None else data, pending)
+        if not settled:
+            return data
+        _user_cache.set(user_id, _NO_DOCUMENT if data is None else data)
+    if data is _NO_DOCUMENT:
         return None
+    # Callers get their own copy so the shared cache entry can't be mutated
+    return copy.deepcopy(data)
+
+def _merge_changes(target, changes):
+    """Coalesce queued changes: {'fields': merged fields, 'events': events by movie, 'compact': flag}"""
+    if changes.get('fields'):
+        merge_fields(target.setdefault('fields', {}), changes['fields'])
+    if changes.get('events'):
+        coalesce_events(target.setdefault('events', {}), changes['events'].values())
+    if changes.get('compact'):
+        target['compact'] = True
+    return target
+
+def _apply_changes(doc, changes):
+    """Apply queued changes to a user document: field merges first, then events in order"""
+    merge_fields(doc, changes.get('fields', {}))
+    return replay(doc, changes.get('events', {}).values())
+
+def _write_user_changes(user_id, changes):
+    """Write one user's coalesced changes at once: O(1) per event, whatever the history"""
+    events = list(changes.get('events', {}).values())
+    if events:
+        get_preference_store().append_feedback(user_id, events, changes.get('fields'))
+    elif changes.get('fields'):
+        get_preference_store().save(user_id, changes['fields'])
+
+    unfolded = _count_events(user_id, added=len(events))
+    if changes.get('compact') or unfolded >= COMPACT_AFTER_EVENTS:
+        try:
+            compact_user_feedback(user_id)
+        except Exception as e:
+            # Events are already durable; compaction is retried after the next write
+            print(f"[WARN] Compacting feedback for {user_id} failed: {e}")
+
+def compact_user_feedback(user_id):
+    """Fold the user's feedback events into their document; returns the number folded"""
+    folded = get_preference_store().compact(user_id)
+    _count_events(user_id, added=-folded)
+    return folded
+
+_user_writes = WriteBehindQueue(_write_user_changes, interval=USER_WRITE_INTERVAL, merge=_merge_changes,
+                                name="user-writes")
+# Best effort: push queued writes before the process exits
+atexit.register(_user_writes.drain)
+
+def _apply_to_cache(user_id, changes):
+    """Apply queued changes to the cached document, if the user is cached"""
+    cached = _user_cache.get(user_id)
+    if cached is None:
+        return
+    merged = {} if cached is _NO_DOCUMENT else copy.deepcopy(cached)
+    _user_cache.set(user_id, _apply_changes(merged, changes))
 
-def save_likes_to_db(user_id, liked_movies, email=None):
-    """Save user likes to Firestore with optimized batch write"""
+def _field_changes(user_id, data):
+    """Queued changes that merge ``data`` into the user's document.
+
+    Feedback lists are not written as fields: events still in the log would
+    be replayed over them. They become a clear followed by one event per
+    movie instead, so the lists replace everything recorded before.
+    """
+    fields = {key: value for key, value in data.items() if key not in FEEDBACK_FIELDS}
+    if not any(key in data for key in FEEDBACK_FIELDS):
+        return {'fields': fields}
+
+    current = get_cached_user_data(user_id) or {}
+    liked, disliked = (data[key] if key in data else current.get(key) or [] for key in FEEDBACK_FIELDS)
+    fields.pop('preferences_set', None)  # follows from the lists when they are replayed
+    events = ([feedback_event(None, CLEAR)]
+              + [feedback_event(movie_id, DISLIKE) for movie_id in disliked]
+              + [feedback_event(movie_id, LIKE) for movie_id in liked])
+    return {'fields': fields, 'events': coalesce_events({}, events)}
+
+def update_user_data(user_id, data):
+    """Merge ``data`` into the user's document now, after any writes already queued for them.
+
+    Raises if the store write fails; the update then stays queued and is retried.
+    """
+    queue_user_update(user_id, data)
+    if _user_writes.drain(user_id):
+        raise RuntimeError(f"Writing user {user_id} failed; the update is queued for retry")
+
+def queue_user_update(user_id, data):
+    """Merge ``data`` into the cached document now and into the store in the background.
+
+    Returns immediately; rapid updates for one user are coalesced into a
+    single write, and failed writes are retried.
+    """
+    changes = _field_changes(user_id, data)
+    _apply_to_cache(user_id, changes)
+    _user_writes.enqueue(user_id, changes)
+
+def migrate_user_feedback(user_id, fields, unmatched=None):
+    """Replace a title-based document's feedback with the id lists in ``fields``.
+
+    The lists are written like any other snapshot, whose clear also drops
+    the title fields, so the migration runs once per user. Titles that
+    matched no movie (``unmatched``, {field: titles}) are kept, not lost.
+    """
+    data = {**fields, LEGACY_UNMATCHED: unmatched} if unmatched else fields
+    changes = {**_field_changes(user_id, data), 'compact': True}
+    _apply_to_cache(user_id, changes)
+    _user_writes.enqueue(user_id, changes)
+
+def record_feedback(user_id, movie_id, kind):
+    """Record one like/dislike/unlike/clear as an append-only event.
+
+    The cached document reflects it immediately; the store gets one small
+    event, never a rewrite of the user's full like lists.
+    """
+    changes = {'events': coalesce_events({}, [feedback_event(movie_id, kind)])}
+    _apply_to_cache(user_id, changes)
+    _user_writes.enqueue(user_id, changes)
+
+def flush_user_updates(user_id=None):
+    """Start writing a user's (or everyone's) queued updates now, e.g. at logout"""
+    _user_writes.flush(user_id)
+
+def save_likes_to_db(user_id, liked_ids, email=None):
+    """Save user likes (TMDB movie ids) to the preference store"""
     try:
-        doc_ref = db.collection('users').document(user_id)
         data = {
-            'liked_movies': liked_movies,
-            'preferences_set': bool(liked_movies)
+            'liked_ids': [int(movie_id) for movie_id in liked_ids],
+            'preferences_set': bool(liked_ids)
         }
         if email:
             data['email'] = email
             
-        doc_ref.set(data, merge=True)
+        update_user_data(user_id, data)
         return {"status": "success"}
     except Exception as e:
-        print(f"[ERROR] Error saving likes to Firestore: {e}")
+        print(f"[ERROR] Error saving likes: {e}")
         return {"status": "error", "message": str(e)}
 
 def get_likes_from_db(user_id):
-    """Get user likes from Firestore with caching"""
-    try:
-        # Try to get from cache first
-        cached_data = get_cached_user_data(user_id)
-        if cached_data:
-            return cached_data.get('liked_movies', [])
-            
-        # If not in cache, get from Firestore
-        doc_ref = db.collection('users').document(user_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            liked_movies = doc.to_dict().get('liked_movies', [])
-            return liked_movies
-        return []
-    except Exception as e:
-        print(f"[ERROR] Error getting likes from Firestore: {e}")
-        return []
+    """Get user likes (TMDB movie ids) from the preference store with caching"""
+    user_data = get_cached_user_data(user_id) or {}
+    return user_data.get('liked_ids') or []
 
 def clear_user_cache(user_id):
-    """Clear user data from cache"""
-    get_cached_user_data.cache_clear()
\ No newline at end of file
+    """Drop one user's cached document; the next read goes to the store"""
+    _user_cache.invalidate(user_id)
+
+def user_cache_stats():
+    """Hit, miss and eviction counters of the user document cache"""
+    return _user_cache.stats()
+
+def user_write_stats():
+    """Pending, coalesced, written and failed counts of queued user writes"""
+    return _user_writes.stats()
+
+def export_user_data():
+    """Every user's document with queued writes applied, as {user_id: document}"""
+    _user_writes.drain()
+    return dict(get_preference_store().export())
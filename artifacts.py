@@ -0,0 +1,139 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from catalog import catalog_fingerprint
+from neighbors import NeighborIndex
+from text_search import ARRAY_NAMES as TEXT_ARRAY_NAMES, BM25Index
+
+MANIFEST_FILE = "manifest.json"
+CATALOG_FILE = "catalog.json"
+TEXT_TERMS_FILE = "bm25_terms.json"
+FORMAT_VERSION = 1
+
+
+class ModelArtifacts:
+    """Model opened from disk: movie table, neighbor index, genre matrix and text index.
+
+    Array data is memory-mapped read-only, so every session and worker process
+    shares the same pages through the OS page cache.
+    """
+
+    def __init__(self, manifest, movies, neighbors, genre_vocab, genre_matrix, text_index=None):
+        self.manifest = manifest
+        self.movies = movies
+        self.neighbors = neighbors
+        self.genre_vocab = genre_vocab
+        self.genre_matrix = genre_matrix
+        self.text_index = text_index
+
+    @property
+    def catalog_version(self):
+        return self.manifest['catalog_version']
+
+
+def _save_array(model_dir, name, array, arrays):
+    filename = f"{name}.npy"
+    np.save(os.path.join(model_dir, filename), np.ascontiguousarray(array))
+    arrays[name] = {"file": filename, "dtype": str(array.dtype), "shape": list(array.shape)}
+
+
+def _write_json_atomic(path, data, **kwargs):
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(data, f, **kwargs)
+    os.replace(path + ".tmp", path)
+
+
+def write_artifacts(model_dir, movies, neighbors, genre_vocab, genre_matrix, text_index=None, **metadata):
+    """Write the model as .npy arrays, a JSON string table and a JSON manifest.
+
+    The manifest is written last and atomically replaced, so readers never
+    see a half-written model. Extra keyword arguments are stored in it as-is.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    movie_ids = movies['movie_id'].to_numpy(dtype=np.int64)
+    titles = [str(t) for t in movies['title']]
+
+    arrays = {}
+    _save_array(model_dir, 'movie_ids', movie_ids, arrays)
+    _save_array(model_dir, 'neighbors_indptr', neighbors.indptr, arrays)
+    _save_array(model_dir, 'neighbors_indices', neighbors.indices, arrays)
+    _save_array(model_dir, 'neighbors_scores', neighbors.scores, arrays)
+    _save_array(model_dir, 'genre_matrix', np.asarray(genre_matrix, dtype=np.uint8), arrays)
+
+    _write_json_atomic(os.path.join(model_dir, CATALOG_FILE), {"title": titles}, ensure_ascii=False)
+
+    if text_index is not None:
+        for name, array in text_index.arrays().items():
+            _save_array(model_dir, f"bm25_{name}", array, arrays)
+        _write_json_atomic(os.path.join(model_dir, TEXT_TERMS_FILE), text_index.terms, ensure_ascii=False)
+        metadata["text_index"] = {"terms": TEXT_TERMS_FILE, "n_docs": text_index.n_docs,
+                                  "scale": text_index.scale}
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "n_movies": len(movies),
+        "arrays": arrays,
+        "strings": CATALOG_FILE,
+        "genre_vocab": [str(g) for g in genre_vocab],
+        "catalog_version": catalog_fingerprint(movie_ids, titles),
+        "neighbors_version": neighbors.version,
+        **metadata,
+    }
+    _write_json_atomic(os.path.join(model_dir, MANIFEST_FILE), manifest, indent=2)
+    return manifest
+
+
+def read_manifest(model_dir):
+    with open(os.path.join(model_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_strings(model_dir, manifest):
+    with open(os.path.join(model_dir, manifest["strings"]), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_string_column(model_dir, column, values, **metadata):
+    """Add or replace a per-movie string column (None allowed) in an existing model.
+
+    Extra keyword arguments are merged into the manifest, which is rewritten
+    last so readers switch over atomically.
+    """
+    manifest = read_manifest(model_dir)
+    strings = read_strings(model_dir, manifest)
+    if len(values) != manifest["n_movies"]:
+        raise ValueError(f"Expected {manifest['n_movies']} values for '{column}', got {len(values)}")
+
+    strings[column] = list(values)
+    _write_json_atomic(os.path.join(model_dir, manifest["strings"]), strings, ensure_ascii=False)
+    manifest.update(metadata)
+    _write_json_atomic(os.path.join(model_dir, MANIFEST_FILE), manifest, indent=2)
+    return manifest
+
+
+def open_artifacts(model_dir):
+    """Open a model written by ``write_artifacts`` with read-only memory maps"""
+    manifest = read_manifest(model_dir)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format version: {manifest.get('format_version')}")
+
+    arrays = {
+        name: np.load(os.path.join(model_dir, spec["file"]), mmap_mode='r')
+        for name, spec in manifest["arrays"].items()
+    }
+    strings = read_strings(model_dir, manifest)
+
+    movies = pd.DataFrame({'movie_id': arrays['movie_ids'], **strings})
+    neighbors = NeighborIndex(arrays['neighbors_indptr'], arrays['neighbors_indices'],
+                              arrays['neighbors_scores'], version=manifest["neighbors_version"])
+    genre_vocab = np.array(manifest["genre_vocab"], dtype=str)
+
+    text_index = None
+    if manifest.get("text_index"):
+        spec = manifest["text_index"]
+        with open(os.path.join(model_dir, spec["terms"]), encoding='utf-8') as f:
+            terms = json.load(f)
+        text_index = BM25Index(terms, {name: arrays[f"bm25_{name}"] for name in TEXT_ARRAY_NAMES},
+                               spec["n_docs"], spec["scale"])
+    return ModelArtifacts(manifest, movies, neighbors, genre_vocab, arrays['genre_matrix'], text_index)
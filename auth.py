@@ -1,5 +1,5 @@
-import requests
 import streamlit as st
+from http_client import get_http_client
 
 # Get Firebase Web API key from secrets
 API_KEY = st.secrets["firebase"]["web_api_key"]
@@ -10,6 +10,9 @@ SIGNIN_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPass
 UPDATE_PROFILE_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:update?key={API_KEY}"
 GET_USER_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:lookup?key={API_KEY}"
 
+# Pooled keep-alive client shared by every login/signup in this process
+http = get_http_client("firebase")
+
 def sign_up(username, email, password, full_name):
     payload = {
         "email": email,
@@ -18,7 +21,7 @@ def sign_up(username, email, password, full_name):
     }
 
     try:
-        response = requests.post(SIGNUP_URL, json=payload)
+        response = http.post(SIGNUP_URL, json=payload)
         result = response.json()
         if "error" in result:
             return {"status": "error", "message": result["error"]["message"]}
@@ -32,7 +35,7 @@ def sign_up(username, email, password, full_name):
             "displayName": full_name,
             "returnSecureToken": True
         }
-        update_response = requests.post(UPDATE_PROFILE_URL, json=update_payload)
+        update_response = http.post(UPDATE_PROFILE_URL, json=update_payload)
 
         return {
             "status": "success",
@@ -54,7 +57,7 @@ def sign_in(email, password):
     }
 
     try:
-        response = requests.post(SIGNIN_URL, json=payload)
+        response = http.post(SIGNIN_URL, json=payload)
         result = response.json()
         if "error" in result:
             return {"status": "error", "message": result["error"]["message"]}
@@ -72,7 +75,7 @@ def sign_in(email, password):
 
 def get_name(id_token):
     try:
-        response = requests.post(GET_USER_URL, json={"idToken": id_token})
+        response = http.post(GET_USER_URL, json={"idToken": id_token})
         result = response.json()
         if "users" in result and result["users"]:
             return result["users"][0].get("displayName", "")
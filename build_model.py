@@ -1,16 +1,39 @@
 import os
-import pickle
 import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import ast
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from neighbors import (DEFAULT_BLOCK_MEMORY, DEFAULT_TOP_K, SparseCosineRows,
+                       block_rows, build_neighbor_index, ranking_agreement)
+from genres import build_genre_matrix
+from artifacts import MANIFEST_FILE, open_artifacts, write_artifacts
+from text_search import BM25Index
+from prefetch_posters import prefetch_poster_paths
+
+# Minimum top-10 overlap between sparse and dense rankings before we warn
+MIN_RANKING_AGREEMENT = 0.9
+
+# CSV rows parsed per ingestion task
+DEFAULT_CHUNKSIZE = 10000
+MOVIE_COLUMNS = ['title', 'overview', 'genres', 'keywords']
+CREDIT_COLUMNS = ['movie_id', 'title', 'cast', 'crew']
+
+def parse_list(text):
+    """Parse a JSON-ish list column, using the C json parser and ast as a fallback"""
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return ast.literal_eval(text)
 
 def convert(text):
     """Convert string representation of list to actual list of names"""
     L = []
     try:
-        for i in ast.literal_eval(text):
+        for i in parse_list(text):
             if isinstance(i, dict) and 'name' in i:
                 L.append(i['name'])
         return L
@@ -22,7 +45,7 @@ def convert3(text):
     L = []
     counter = 0
     try:
-        for i in ast.literal_eval(text):
+        for i in parse_list(text):
             if counter < 3:
                 if isinstance(i, dict) and 'name' in i:
                     L.append(i['name'])
@@ -37,7 +60,7 @@ def fetch_director(text):
     """Extract director from crew data"""
     L = []
     try:
-        for i in ast.literal_eval(text):
+        for i in parse_list(text):
             if isinstance(i, dict) and i.get('job') == 'Director':
                 L.append(i['name'])
         return L
@@ -53,7 +76,57 @@ def collapse(L):
         return L1
     return []
 
-def build_recommendation_model():
+def process_movies_chunk(chunk):
+    """Parse overview, genres and keywords for one chunk of the movies CSV"""
+    chunk = chunk.dropna()
+    return pd.DataFrame({
+        'title': chunk['title'].to_numpy(),
+        'overview': [x.split() for x in chunk['overview']],
+        'genres': [collapse(convert(x)) for x in chunk['genres']],
+        'keywords': [convert(x) for x in chunk['keywords']],
+    })
+
+def process_credits_chunk(chunk):
+    """Parse top cast and director for one chunk of the credits CSV.
+
+    Names are kept as written; they are collapsed into single tags later so
+    full-text search can still match "nolan" on its own.
+    """
+    chunk = chunk.dropna()
+    return pd.DataFrame({
+        'movie_id': chunk['movie_id'].to_numpy(),
+        'title': chunk['title'].to_numpy(),
+        'cast': [convert3(x) for x in chunk['cast']],
+        'crew': [fetch_director(x) for x in chunk['crew']],
+    })
+
+def map_chunks(func, chunks, workers):
+    """Apply func to each chunk on a process pool, yielding results in input order.
+
+    At most 2 * workers chunks are in flight, so peak memory is bounded by the
+    chunk size rather than the file size.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def ingest_csv(path, usecols, func, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Stream a CSV in chunks through func and concatenate the compact results"""
+    reader = pd.read_csv(path, usecols=usecols, chunksize=chunksize)
+    return pd.concat(map_chunks(func, reader, workers), ignore_index=True)
+
+def build_recommendation_model(top_k=DEFAULT_TOP_K, workers=1, chunksize=DEFAULT_CHUNKSIZE,
+                               block_size=None, block_memory=DEFAULT_BLOCK_MEMORY):
     """Build and save the movie recommendation model"""
     
     # Paths
@@ -79,9 +152,12 @@ def build_recommendation_model():
         return False
     
     try:
-        # Load datasets
-        movies = pd.read_csv(MOVIES_PATH)
-        credits = pd.read_csv(CREDITS_PATH)
+        # Stream and parse datasets in chunks
+        print(f"Processing movies ({workers} workers, {chunksize} rows per chunk)...")
+        movies = ingest_csv(MOVIES_PATH, MOVIE_COLUMNS, process_movies_chunk, chunksize, workers)
+        
+        print("Processing credits...")
+        credits = ingest_csv(CREDITS_PATH, CREDIT_COLUMNS, process_credits_chunk, chunksize, workers)
         
         print(f"Movies dataset shape: {movies.shape}")
         print(f"Credits dataset shape: {credits.shape}")
@@ -91,44 +167,20 @@ def build_recommendation_model():
         
         print(f"Merged dataset shape: {movies.shape}")
         
-        # Select relevant columns
-        movies = movies[['movie_id', 'title', 'overview', 'genres', 'keywords', 'cast', 'crew']]
-        
-        # Remove rows with missing values
-        movies.dropna(inplace=True)
-        
-        print(f"After removing NaN values: {movies.shape}")
-        
-        # Convert string representations to lists
-        print("Processing genres...")
-        movies['genres'] = movies['genres'].apply(convert)
-        
-        print("Processing keywords...")
-        movies['keywords'] = movies['keywords'].apply(convert)
-        
-        print("Processing cast...")
-        movies['cast'] = movies['cast'].apply(convert3)
-        
-        print("Processing crew...")
-        movies['crew'] = movies['crew'].apply(fetch_director)
-        
-        # Clean overview text
-        movies['overview'] = movies['overview'].apply(lambda x: x.split() if isinstance(x, str) else [])
-        
-        # Remove spaces from names
-        movies['cast'] = movies['cast'].apply(collapse)
-        movies['crew'] = movies['crew'].apply(collapse)
-        movies['genres'] = movies['genres'].apply(collapse)
-        movies['keywords'] = movies['keywords'].apply(collapse)
-        
         # Create tags column by combining all features
-        movies['tags'] = movies['overview'] + movies['genres'] + movies['keywords'] + movies['cast'] + movies['crew']
+        names = movies['keywords'] + movies['cast'] + movies['crew']
+        movies['tags'] = movies['overview'] + movies['genres'] + [collapse(x) for x in names]
         
         # Create new dataframe with required columns
         new = movies[['movie_id', 'title', 'tags', 'genres']].copy()
+        del movies, credits
         
         # Convert tags list to string
-        new['tags'] = new['tags'].apply(lambda x: " ".join(x).lower())
+        new['tags'] = [" ".join(x).lower() for x in new['tags']]
+        
+        # Full-text documents: the tags plus the uncollapsed names
+        search_docs = [f"{tags} {' '.join(n)}" for tags, n in zip(new['tags'], names)]
+        del names
         
         print(f"Final dataset shape: {new.shape}")
         print("Sample data:")
@@ -139,26 +191,46 @@ def build_recommendation_model():
         cv = CountVectorizer(max_features=5000, stop_words='english')
         
         print("Fitting and transforming text data...")
-        vector = cv.fit_transform(new['tags']).toarray()
+        vector = cv.fit_transform(new['tags'])
+        
+        print(f"Vector shape: {vector.shape} (sparse, {vector.nnz} non-zeros)")
+        
+        block_size = block_size or block_rows(vector.shape[0], block_memory)
+        print(f"Computing top-{top_k} cosine neighbors in blocks of {block_size} rows...")
+        similarity = SparseCosineRows(vector)
+        neighbors = build_neighbor_index(similarity, k=top_k, block_size=block_size)
         
-        print(f"Vector shape: {vector.shape}")
+        dense_mb = similarity.shape[0] ** 2 * 8 / 1e6
+        print(f"Neighbor index size: {neighbors.nbytes / 1e6:.1f} MB "
+              f"(dense matrix would be: {dense_mb:.1f} MB)")
         
-        print("Computing cosine similarity... This may take a while...")
-        similarity = cosine_similarity(vector)
+        agreement = ranking_agreement(similarity, neighbors)
+        print(f"Top-10 ranking agreement with dense similarity: {agreement:.1%}")
+        if agreement < MIN_RANKING_AGREEMENT:
+            print(f"⚠️ Agreement below {MIN_RANKING_AGREEMENT:.0%}, consider a larger --top-k")
         
-        print(f"Similarity matrix shape: {similarity.shape}")
+        print("Building BM25 full-text index...")
+        text_index = BM25Index.build(search_docs)
+        del search_docs
+        print(f"Text index: {len(text_index.terms)} terms, {len(text_index.impacts)} postings, "
+              f"{text_index.nbytes / 1e6:.1f} MB")
         
-        # Save the processed data and similarity matrix
-        print("Saving movie list...")
-        pickle.dump(new, open(os.path.join(MODEL_DIR, 'movie_list.pkl'), 'wb'))
+        print("Building genre matrix...")
+        genre_vocab, genre_matrix = build_genre_matrix(new['genres'])
+        print(f"Genre vocabulary: {len(genre_vocab)} genres")
         
-        print("Saving similarity matrix...")
-        pickle.dump(similarity, open(os.path.join(MODEL_DIR, 'similarity.pkl'), 'wb'))
+        # Save the model as memory-mappable arrays plus a JSON manifest
+        print("Saving model artifacts...")
+        manifest = write_artifacts(MODEL_DIR, new, neighbors, genre_vocab, genre_matrix,
+                                   text_index=text_index, top_k=top_k, ranking_agreement=agreement)
         
         print("✅ Model built successfully!")
         print(f"Files saved in {MODEL_DIR}/ directory:")
-        print("- movie_list.pkl")
-        print("- similarity.pkl")
+        print(f"- {MANIFEST_FILE}")
+        print(f"- {manifest['strings']}")
+        print(f"- {manifest['text_index']['terms']}")
+        for spec in manifest['arrays'].values():
+            print(f"- {spec['file']}")
         
         return True
         
@@ -169,24 +241,23 @@ def build_recommendation_model():
 def test_model():
     """Test the built model"""
     MODEL_DIR = "model"
-    MOVIE_PKL = os.path.join(MODEL_DIR, "movie_list.pkl")
-    SIMILARITY_PKL = os.path.join(MODEL_DIR, "similarity.pkl")
     
     try:
         print("Testing model files...")
-        movies = pickle.load(open(MOVIE_PKL, 'rb'))
-        similarity = pickle.load(open(SIMILARITY_PKL, 'rb'))
+        artifacts = open_artifacts(MODEL_DIR)
+        movies = artifacts.movies
+        neighbors = artifacts.neighbors
         
         print(f"✅ Movies loaded: {len(movies)} movies")
-        print(f"✅ Similarity matrix loaded: {similarity.shape}")
+        print(f"✅ Neighbor index loaded: {neighbors.shape}, {len(neighbors.indices)} entries")
         
         # Test recommendation function
         def recommend(movie):
-            index = movies[movies['title'] == movie].index[0]
-            distances = sorted(list(enumerate(similarity[index])), reverse=True, key=lambda x: x[1])
+            index = int(np.flatnonzero(movies['title'].to_numpy() == movie)[0])
+            neighbor_rows, _ = neighbors.row(index)
             recommended_movies = []
-            for i in distances[1:6]:  # Top 5 recommendations
-                recommended_movies.append(movies.iloc[i[0]].title)
+            for i in neighbor_rows[:5]:  # Top 5 recommendations
+                recommended_movies.append(movies.iloc[i].title)
             return recommended_movies
         
         # Test with a popular movie
@@ -204,16 +275,42 @@ def test_model():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the movie recommendation model")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K,
+                        help=f"neighbors kept per movie (default: {DEFAULT_TOP_K})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes used to parse the datasets (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"CSV rows per parsing task (default: {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--block-memory", type=int, default=DEFAULT_BLOCK_MEMORY // 2**20,
+                        help=f"MB for one block of similarity rows (default: {DEFAULT_BLOCK_MEMORY // 2**20})")
+    parser.add_argument("--block-size", type=int, default=None,
+                        help="similarity rows computed at once (default: as many as fit in --block-memory)")
+    parser.add_argument("--prefetch-posters", action="store_true",
+                        help="resolve TMDB poster paths for the catalog after building (see prefetch_posters.py)")
+    parser.add_argument("--tmdb-api-key", default=os.environ.get("TMDB_API_KEY", ""),
+                        help="TMDB API key for --prefetch-posters (default: $TMDB_API_KEY)")
+    args = parser.parse_args()
+    
     print("🎬 Building Movie Recommendation Model...")
     print("=" * 50)
     
-    success = build_recommendation_model()
+    success = build_recommendation_model(top_k=args.top_k, workers=args.workers, chunksize=args.chunksize,
+                                         block_size=args.block_size, block_memory=args.block_memory * 2**20)
     
     if success:
         print("\n" + "=" * 50)
         print("Testing the built model...")
         test_success = test_model()
         
+        if test_success and args.prefetch_posters:
+            print("\n" + "=" * 50)
+            print("Prefetching poster paths...")
+            if args.tmdb_api_key:
+                prefetch_poster_paths("model", args.tmdb_api_key, workers=args.workers)
+            else:
+                print("⚠️ No TMDB API key given, skipping poster prefetch")
+        
         if test_success:
             print("\n🎉 Everything is ready! You can now run your Streamlit app.")
         else:
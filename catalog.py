@@ -0,0 +1,107 @@
+import hashlib
+import sys
+import numpy as np
+from genres import build_genre_matrix
+
+
+def catalog_fingerprint(movie_ids, titles):
+    """Stable content hash identifying a catalog version"""
+    return hashlib.sha1(
+        np.asarray(movie_ids, dtype=np.int64).tobytes() + "\0".join(map(str, titles)).encode()
+    ).hexdigest()
+
+
+class MovieCatalog:
+    """Movie table plus hash indexes built once at load time.
+
+    All lookups return row positions (usable with ``movies.iloc`` and the
+    neighbor index), never DataFrame index labels. The multi-hot genre matrix
+    comes from the build artifact when given, otherwise it is parsed once here.
+    """
+
+    def __init__(self, movies, genre_vocab=None, genre_matrix=None, version=None, text_index=None):
+        self.movies = movies
+        self.titles = movies['title'].to_numpy()
+        self.movie_ids = movies['movie_id'].to_numpy()
+
+        self.title_to_row = {}
+        self.lower_to_rows = {}
+        for row, title in enumerate(self.titles):
+            self.title_to_row.setdefault(title, row)
+            self.lower_to_rows.setdefault(str(title).lower(), []).append(row)
+
+        # Poster paths baked in by prefetch_posters.py: None = unknown, "" = TMDB has none
+        self.poster_paths = movies['poster_path'].to_numpy() if 'poster_path' in movies.columns else None
+
+        self.id_to_row = {}
+        for row, movie_id in enumerate(self.movie_ids):
+            self.id_to_row.setdefault(int(movie_id), row)
+        # Sorted ids (first row per id) for vectorized id -> row lookups
+        self._sorted_ids = np.fromiter(self.id_to_row.keys(), dtype=np.int64, count=len(self.id_to_row))
+        self._sorted_id_rows = np.fromiter(self.id_to_row.values(), dtype=np.int64, count=len(self.id_to_row))
+        order = np.argsort(self._sorted_ids)
+        self._sorted_ids, self._sorted_id_rows = self._sorted_ids[order], self._sorted_id_rows[order]
+
+        if genre_matrix is None or len(genre_matrix) != len(movies):
+            genre_vocab, genre_matrix = build_genre_matrix(movies['genres'])
+        self.genre_vocab = genre_vocab
+        self.genre_matrix = genre_matrix
+
+        # BM25 over overview, genres, keywords, cast and crew; None for models built without one
+        self.text_index = text_index
+
+        self.version = version or catalog_fingerprint(self.movie_ids, self.titles)
+
+    def __len__(self):
+        return len(self.titles)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the id arrays and title/id hash tables; the movies frame is counted by its owner"""
+        tables = (self.title_to_row, self.lower_to_rows, self.id_to_row)
+        return (self._sorted_ids.nbytes + self._sorted_id_rows.nbytes
+                + sum(sys.getsizeof(table) for table in tables)
+                + sum(sys.getsizeof(title) + sys.getsizeof(rows) for title, rows in self.lower_to_rows.items())
+                + sum(sys.getsizeof(movie_id) for movie_id in self.id_to_row))
+
+    def row_of(self, title):
+        """Row of the first movie with exactly this title, or None"""
+        return self.title_to_row.get(title)
+
+    def rows_of(self, titles):
+        """Rows for the titles that exist in the catalog, in input order"""
+        return [row for row in map(self.title_to_row.get, titles) if row is not None]
+
+    def rows_for_lower(self, title_lower):
+        """All rows whose lowercase title equals ``title_lower``"""
+        return self.lower_to_rows.get(title_lower, [])
+
+    def row_of_id(self, movie_id):
+        """Row of the movie with this TMDB id, or None"""
+        return self.id_to_row.get(int(movie_id))
+
+    def rows_of_ids(self, movie_ids):
+        """Rows for the ids that exist in the catalog, in input order (int64 array)"""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.empty(0, dtype=np.int64)
+        slots = np.minimum(np.searchsorted(self._sorted_ids, movie_ids), len(self._sorted_ids) - 1)
+        found = self._sorted_ids[slots] == movie_ids
+        return self._sorted_id_rows[slots[found]]
+
+    def ids_of_titles(self, titles):
+        """TMDB ids of the titles that exist in the catalog (first movie per title), in input order"""
+        return [int(self.movie_ids[row]) for row in self.rows_of(titles)]
+
+    def poster_path_of_id(self, movie_id):
+        """Prefetched poster path for a movie id, or None if it was never resolved"""
+        if self.poster_paths is None:
+            return None
+        row = self.id_to_row.get(int(movie_id))
+        return None if row is None else self.poster_paths[row]
+
+    def title(self, row):
+        return self.titles[row]
+
+    def movie_id(self, row):
+        return int(self.movie_ids[row])
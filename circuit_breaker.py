@@ -0,0 +1,91 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker for a flaky upstream.
+
+    Trips to ``open`` after ``failure_threshold`` consecutive failures; while
+    open, ``allow_request()`` refuses calls so callers can serve a fallback
+    at once. After ``reset_timeout`` seconds it goes ``half_open`` and lets a
+    single probe through: success closes the circuit, failure re-opens it.
+    Results of requests that were already in flight when it opened are ignored.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self.trips = 0
+        self.rejected = 0
+
+    def allow_request(self):
+        with self._lock:
+            if self._state == OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state == OPEN:
+                # A request that started before the circuit opened; keep cooling down
+                return
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._probe_in_flight = False
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == OPEN:
+                # Started before the circuit opened; must not extend the cooldown
+                return
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self.trips += 1
+                self._state = OPEN
+                self._opened_at = self.clock()
+                self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def snapshot(self):
+        """State summary for debugging"""
+        state = self.state
+        with self._lock:
+            retry_in = None
+            if state == OPEN:
+                retry_in = round(self.reset_timeout - (self.clock() - self._opened_at), 1)
+            return {
+                'name': self.name,
+                'state': state,
+                'consecutive_failures': self._failures,
+                'retry_in_seconds': retry_in,
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
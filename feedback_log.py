@@ -0,0 +1,77 @@
+import copy
+import time
+
+# Event types; each like/dislike/unlike fully determines that movie's state
+LIKE = "like"
+DISLIKE = "dislike"
+UNLIKE = "unlike"
+CLEAR = "clear"
+
+# Documents written before feedback was keyed by TMDB id hold title lists
+LEGACY_FIELDS = ('liked_movies', 'disliked_movies', 'movie_feedback')
+# Titles from those lists that matched no catalog movie when migrated, as {field: titles}
+LEGACY_UNMATCHED = 'legacy_unmatched'
+
+# Coalescing key of a clear event, which supersedes everything queued before it
+_CLEAR_KEY = "*"
+
+
+def feedback_event(movie_id, kind, ts=None):
+    """One append-only feedback record"""
+    return {'movie_id': None if movie_id is None else int(movie_id), 'type': kind,
+            'ts': time.time() if ts is None else ts}
+
+
+def is_migrated(doc):
+    """True once no title-keyed feedback is left (events alone don't migrate a document)"""
+    return not any(doc.get(field) for field in LEGACY_FIELDS)
+
+
+def apply_event(doc, event):
+    """Apply one event to a user document in place and return it"""
+    kind = event.get('type')
+
+    if kind == CLEAR:
+        doc['liked_ids'], doc['disliked_ids'] = [], []
+        for field in LEGACY_FIELDS:
+            doc[field] = None
+    elif event.get('movie_id') is not None:
+        liked = doc.setdefault('liked_ids', [])
+        disliked = doc.setdefault('disliked_ids', [])
+        movie_id = event['movie_id']
+        if kind in (LIKE, DISLIKE):
+            add, remove = (liked, disliked) if kind == LIKE else (disliked, liked)
+            if movie_id in remove:
+                remove.remove(movie_id)
+            if movie_id not in add:
+                add.append(movie_id)
+        elif kind == UNLIKE and movie_id in liked:
+            liked.remove(movie_id)
+
+    doc['preferences_set'] = any(doc.get(field) for field in
+                                 ('liked_ids', 'disliked_ids', 'liked_movies', 'disliked_movies'))
+    return doc
+
+
+def replay(doc, events):
+    """Apply events in order to a user document"""
+    for event in events:
+        apply_event(doc, event)
+    return doc
+
+
+def coalesce_events(pending, events):
+    """Merge new events into ``pending`` ({key: event}), keeping only what changes the outcome.
+
+    A later event for the same movie replaces the earlier one and moves to
+    the end; a clear drops everything queued before it.
+    """
+    for event in events:
+        if event.get('type') == CLEAR:
+            pending.clear()
+            key = _CLEAR_KEY
+        else:
+            key = event['movie_id']
+            pending.pop(key, None)
+        pending[key] = copy.deepcopy(event)
+    return pending
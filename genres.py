@@ -0,0 +1,28 @@
+import ast
+import numpy as np
+
+
+def parse_genres(raw):
+    """Return genre names from a stored genres value (list or its string form)"""
+    try:
+        parsed = ast.literal_eval(raw) if isinstance(raw, str) else raw
+        return [g['name'] if isinstance(g, dict) else g for g in parsed
+                if isinstance(g, str) or (isinstance(g, dict) and 'name' in g)]
+    except Exception:
+        return []
+
+
+def build_genre_matrix(genre_lists):
+    """Build (vocab, matrix) where matrix[i, g] == 1 if movie i has genre vocab[g].
+
+    ``genre_lists`` is an iterable of genre lists (or their string forms).
+    The matrix is uint8 multi-hot with one row per movie.
+    """
+    parsed = [parse_genres(raw) for raw in genre_lists]
+    vocab = sorted({g for genres in parsed for g in genres})
+    position = {g: i for i, g in enumerate(vocab)}
+
+    matrix = np.zeros((len(parsed), len(vocab)), dtype=np.uint8)
+    for row, genres in enumerate(parsed):
+        matrix[row, [position[g] for g in genres]] = 1
+    return np.array(vocab, dtype=str), matrix
@@ -0,0 +1,111 @@
+import random
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.3
+# Requests in flight per host, and keep-alive connections pooled for it; further
+# calls wait up to DEFAULT_SLOT_TIMEOUT seconds for a slot
+DEFAULT_MAX_PER_HOST = 8
+DEFAULT_SLOT_TIMEOUT = 10
+# Distinct hosts whose connection pools are kept alive
+DEFAULT_POOL_HOSTS = 10
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with exponential backoff scaled by a random factor in [0.5, 1.5)"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff * random.uniform(0.5, 1.5) if backoff else 0
+
+
+class HostBusyError(requests.exceptions.ConnectionError):
+    """No request slot for the host freed up within the slot timeout"""
+
+
+class HttpClient:
+    """Shared requests.Session with keep-alive pools and retries.
+
+    Connections are reused across calls, so TCP and TLS handshakes are paid
+    once per host rather than per request. Idempotent requests are retried on
+    connection errors, read errors and RETRY_STATUSES with jittered exponential
+    backoff (honouring Retry-After). POSTs are only retried when the
+    connection failed before the request was sent.
+
+    At most ``max_per_host`` requests (retries included) run against one
+    host at a time; the rest wait up to ``slot_timeout`` seconds and then
+    raise HostBusyError.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF,
+                 max_per_host=DEFAULT_MAX_PER_HOST, pool_hosts=DEFAULT_POOL_HOSTS,
+                 slot_timeout=DEFAULT_SLOT_TIMEOUT):
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.slot_timeout = slot_timeout
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+        retry = JitteredRetry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=max_per_host,
+                              pool_block=False, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _host_slots(self, host):
+        with self._slots_lock:
+            slots = self._slots.get(host)
+            if slots is None:
+                slots = self._slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return slots
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        slots = self._host_slots(host)
+        if not slots.acquire(timeout=self.slot_timeout):
+            raise HostBusyError(f"{self.max_per_host} requests to {host} already in flight")
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            slots.release()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(name="default", **options):
+    """Return the process-wide client registered under ``name``, creating it on first use.
+
+    ``options`` are passed to HttpClient the first time only, so each upstream
+    (e.g. "tmdb", "firebase") gets its own pool and retry policy.
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = HttpClient(**options)
+        return client
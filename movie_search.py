@@ -0,0 +1,228 @@
+import numpy as np
+import streamlit as st
+from search_index import PrefixIndex, TrigramIndex
+from ttl_cache import TTLCache
+
+# Rows returned by the search tab and suggestions shown under the search box
+SEARCH_LIMIT = 20
+SUGGESTION_LIMIT = 10
+
+# Results depend only on the query and the model version, so a bounded LRU is enough
+QUERY_CACHE_SIZE = 2048
+QUERY_CACHE_TTL = 3600
+
+MIN_QUERY_LENGTH = 2
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace; equivalent queries share one cache entry"""
+    return " ".join(str(query or "").lower().split())
+
+
+class MovieSearch:
+    """Title autocomplete and search over one catalog version.
+
+    Holds the prefix, trigram and full-text indexes and a per-query LRU keyed
+    by the normalized query text, so a keystroke costs a dictionary lookup
+    on repeat and never hashes or mutates the movies DataFrame. All results
+    are catalog row positions or titles.
+    """
+
+    def __init__(self, catalog, cache_size=QUERY_CACHE_SIZE, cache_ttl=QUERY_CACHE_TTL):
+        self.catalog = catalog
+        self.version = catalog.version
+        self.prefix_index = PrefixIndex(catalog.titles)
+        self.trigram_index = TrigramIndex(catalog.lower_to_rows)
+        self.text_index = catalog.text_index
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    # === Index lookups ===
+
+    def rows_with_prefix(self, prefix_lower, limit=None):
+        """Rows whose lowercase title starts with ``prefix_lower``, alphabetically"""
+        return self.prefix_index.rows_with_prefix(prefix_lower, limit)
+
+    def rows_containing(self, query_lower):
+        """Yield rows whose lowercase title contains ``query_lower`` literally.
+
+        Rows are grouped by lowercase title, in order of each title's first
+        appearance in the catalog. Callers can stop consuming early.
+        """
+        index = self.trigram_index
+        for position in index.containing(query_lower):
+            yield from self.catalog.rows_for_lower(index.strings[position])
+
+    def close_lower_titles(self, query_lower, n=5, cutoff=0.6):
+        """Lowercase titles most similar to ``query_lower`` (approximates difflib.get_close_matches, see TrigramIndex)"""
+        return self.trigram_index.close_matches(query_lower, n=n, cutoff=cutoff)
+
+    def rows_matching_text(self, query, k=10):
+        """Rows of the ``k`` best full-text (BM25) matches for ``query``, best first"""
+        if self.text_index is None:
+            return []
+        rows, _ = self.text_index.search(query, k)
+        return rows.tolist()
+
+    # === Ranked results ===
+
+    def _collect(self, limit):
+        """Return (rows, add) where add(rows) appends rows with unseen titles up to ``limit``"""
+        titles = self.catalog.titles
+        rows, seen = [], set()
+
+        def add(candidates):
+            for row in candidates:
+                if len(rows) >= limit:
+                    return
+                if titles[row] not in seen:
+                    seen.add(titles[row])
+                    rows.append(row)
+        return rows, add
+
+    def _title_matches(self, query, limit, typeahead):
+        """Prefix rows (at most ``limit``) and an iterable of contains rows for ``query``"""
+        if typeahead is None:
+            return self.rows_with_prefix(query, limit), self.rows_containing(query)
+
+        lo, hi, candidates = typeahead.refine(query)
+        strings = self.trigram_index.strings
+        prefix_rows = self.prefix_index.rows[lo:min(hi, lo + limit)].tolist()
+        contains_rows = (row for p in self.trigram_index.verify(candidates, query)
+                         for row in self.catalog.rows_for_lower(strings[p]))
+        return prefix_rows, contains_rows
+
+    def _suggest(self, query, limit, typeahead=None):
+        rows, add = self._collect(limit)
+        prefix_rows, contains_rows = self._title_matches(query, limit, typeahead)
+
+        # 1. Exact matches (case insensitive)
+        add(self.catalog.rows_for_lower(query))
+
+        # 2. Starts with matches (prefix index: no scan, at most `limit` rows)
+        add(prefix_rows)
+
+        # 3. Contains matches (literal, from the trigram index; stops once the list is full)
+        if len(rows) < limit:
+            add(contains_rows)
+
+        # 4. Fuzzy matches for better suggestions
+        if len(rows) < limit:
+            add(self.catalog.rows_for_lower(m)[0] for m in self.close_lower_titles(query, n=5, cutoff=0.6))
+
+        return tuple(self.catalog.title(row) for row in rows)
+
+    def _search(self, query, limit, typeahead=None):
+        rows, add = self._collect(limit)
+        prefix_rows, contains_rows = self._title_matches(query, limit, typeahead)
+
+        # 1-3. Exact, starts with, then contains matches
+        add(self.catalog.rows_for_lower(query))
+        add(prefix_rows)
+        add(contains_rows)
+
+        # 4. Fuzzy matches if we have few results
+        if len(rows) < 10:
+            add(row for m in self.close_lower_titles(query, n=10, cutoff=0.6)
+                for row in self.catalog.rows_for_lower(m))
+
+        # 5. Plot, keyword, cast and crew matches (BM25) fill the rest of the page
+        if len(rows) < limit:
+            add(self.rows_matching_text(query, limit))
+
+        return tuple(rows)
+
+    def _cached(self, kind, query, limit, compute, typeahead):
+        query = normalize_query(query)
+        if len(query) < MIN_QUERY_LENGTH:
+            return ()
+        key = (kind, query, limit)
+        result = self.cache.get(key)
+        if result is None:
+            result = compute(query, limit, typeahead)
+            self.cache.set(key, result)
+        return result
+
+    def suggest(self, query, limit=SUGGESTION_LIMIT, typeahead=None):
+        """Autocomplete titles: exact, starts with, contains, then fuzzy matches.
+
+        Pass the session's ``TypeAhead`` to narrow the previous keystroke's
+        candidates instead of looking the query up from scratch.
+        """
+        return list(self._cached('suggest', query, limit, self._suggest, typeahead))
+
+    def search(self, query, limit=SEARCH_LIMIT, typeahead=None):
+        """Search result rows: title matches in the same order as suggest, then full-text matches"""
+        return list(self._cached('search', query, limit, self._search, typeahead))
+
+    def memory_usage(self):
+        usage = {
+            'prefix_index': self.prefix_index.nbytes,
+            'trigram_index': self.trigram_index.nbytes,
+            'text_index': self.text_index.nbytes if self.text_index is not None else 0,
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def stats(self):
+        return {'version': self.version[:12], 'query_cache': self.cache.stats()}
+
+
+class TypeAhead:
+    """One session's title candidates for the query it typed last.
+
+    When the next query extends that one ("ava" -> "avat"), its prefix span
+    lies inside the previous span and its contains-matches are a subset of
+    the previous candidates, so both are narrowed in time proportional to
+    the previous candidate set. Candidates are verified lazily, only as far
+    as the results page needs. Any other edit (a deletion, a pasted query)
+    falls back to a full index lookup.
+    """
+
+    def __init__(self, search):
+        self.search = search
+        self.version = search.version
+        self.query = None
+        self.lo, self.hi = 0, len(search.prefix_index)
+        self.candidates = np.empty(0, dtype=np.int32)
+        self.refined = 0
+        self.full_lookups = 0
+
+    def refine(self, query):
+        """Return (lo, hi, candidates) for ``query``.
+
+        ``lo:hi`` is the prefix index span; ``candidates`` are trigram-index
+        positions that may contain ``query`` and still need ``verify``.
+        """
+        if query == self.query:
+            return self.lo, self.hi, self.candidates
+
+        trigram_index = self.search.trigram_index
+        if self.query is not None and query.startswith(self.query):
+            self.lo, self.hi = self.search.prefix_index.span(query, self.lo, self.hi)
+            self.candidates = trigram_index.narrow_candidates(self.candidates, query, self.query)
+            self.refined += 1
+        else:
+            self.lo, self.hi = self.search.prefix_index.span(query)
+            self.candidates = trigram_index.substring_candidates(query)
+            self.full_lookups += 1
+
+        self.query = query
+        return self.lo, self.hi, self.candidates
+
+    def stats(self):
+        return {'query': self.query, 'candidates': len(self.candidates),
+                'refined': self.refined, 'full_lookups': self.full_lookups}
+
+
+def session_typeahead(search):
+    """This session's TypeAhead for ``search``, recreated when the model version changes"""
+    typeahead = st.session_state.get('typeahead')
+    if typeahead is None or typeahead.version != search.version:
+        typeahead = st.session_state['typeahead'] = TypeAhead(search)
+    return typeahead
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_movie_search(version, _catalog):
+    """Build the search indexes once per model version and share them with every session"""
+    return MovieSearch(_catalog)
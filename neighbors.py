@@ -0,0 +1,165 @@
+import hashlib
+import numpy as np
+from sklearn.preprocessing import normalize
+
+# Number of neighbours kept per movie when the index is built
+DEFAULT_TOP_K = 50
+
+# Memory for one block of similarity rows while building the index; the
+# rows per block follow from it and the catalog size
+DEFAULT_BLOCK_MEMORY = 256 * 2**20  # bytes
+
+# Bytes per similarity cell of a block: the sparse product (float32 value and
+# int32 column), its dense float32 copy and argpartition's int64 indices
+BLOCK_BYTES_PER_CELL = 20
+
+
+class NeighborIndex:
+    """Sparse per-movie top-K neighbour index stored as CSR arrays.
+
+    Row ``i`` holds the K most similar movies to movie ``i`` (itself excluded),
+    so memory grows with N*K instead of the N*N dense similarity matrix.
+    """
+
+    def __init__(self, indptr, indices, scores, version=None):
+        # asarray keeps read-only memory maps as they are (no copy) when dtypes match
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.version = version or hashlib.sha1(
+            self.indptr.tobytes() + self.indices.tobytes() + self.scores.tobytes()
+        ).hexdigest()
+
+    @property
+    def n_movies(self):
+        return len(self.indptr) - 1
+
+    @property
+    def shape(self):
+        return (self.n_movies, self.n_movies)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.scores.nbytes
+
+    def row(self, i):
+        """Return (neighbour_rows, scores) for movie row ``i``"""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.scores[start:end]
+
+    def weighted_sum(self, rows, weights):
+        """Return the dense score vector sum(weights[i] * row(rows[i])) over all movies"""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        if lengths.sum() == 0:
+            return np.zeros(self.n_movies, dtype=np.float64)
+        positions = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        contrib = self.scores[positions] * np.repeat(np.asarray(weights, dtype=np.float64), lengths)
+        return np.bincount(self.indices[positions], weights=contrib, minlength=self.n_movies)
+
+
+class SparseCosineRows:
+    """Cosine similarity over sparse count vectors, computed a block of rows at a time.
+
+    Rows are L2-normalised once; ``rows[start:end]`` returns the dense
+    (end - start) x N similarity block, so the full N x N matrix and the dense
+    count matrix are never materialised.
+    """
+
+    def __init__(self, vectors):
+        self.vectors = normalize(vectors.astype(np.float32), norm='l2').tocsr()
+        self.vectors_t = self.vectors.T.tocsr()
+        n = self.vectors.shape[0]
+        self.shape = (n, n)
+
+    def __getitem__(self, rows):
+        block = (self.vectors[rows] @ self.vectors_t).toarray()
+        return block[0] if np.isscalar(rows) else block
+
+
+def top_k_rows(block, k, row_offset=0):
+    """Keep the K highest-scoring columns of each row in a dense similarity block.
+
+    ``row_offset`` is the global row number of the block's first row, used to
+    drop each movie's similarity to itself. Returns (indices, scores) of shape
+    (rows, k) sorted by descending score. A float32 block is not copied.
+    """
+    block = np.asarray(block, dtype=np.float32)
+    n_rows, n_cols = block.shape
+    k = min(k, n_cols - 1)
+    if k <= 0:
+        return np.empty((n_rows, 0), dtype=np.int32), np.empty((n_rows, 0), dtype=np.float32)
+
+    # Take one extra column and drop the movie itself from it, rather than masking the block
+    part = np.argpartition(block, -(k + 1), axis=1)[:, -(k + 1):]
+    part_scores = np.take_along_axis(block, part, axis=1)
+    self_cols = (np.arange(n_rows) + row_offset)[:, None]
+    part_scores = np.where(part == self_cols, -np.inf, part_scores).astype(np.float32)
+    order = np.argsort(-part_scores, axis=1)[:, :k]
+    return (np.take_along_axis(part, order, axis=1).astype(np.int32),
+            np.take_along_axis(part_scores, order, axis=1))
+
+
+def block_rows(n, memory=DEFAULT_BLOCK_MEMORY):
+    """Similarity rows per block that keep one block of an ``n``-movie catalog within ``memory`` bytes"""
+    return max(1, int(memory) // (BLOCK_BYTES_PER_CELL * max(n, 1)))
+
+
+def from_top_k(indices, scores):
+    """Assemble a NeighborIndex from (rows, k) neighbour arrays, dropping zero scores"""
+    keep = scores > 0
+    counts = keep.sum(axis=1)
+    indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return NeighborIndex(indptr, indices[keep], scores[keep])
+
+
+def build_neighbor_index(similarity, k=DEFAULT_TOP_K, block_size=None, block_memory=DEFAULT_BLOCK_MEMORY):
+    """Reduce N*N similarity to a top-K NeighborIndex, one block of rows at a time.
+
+    ``similarity`` is a dense matrix or a ``SparseCosineRows``. Unless
+    ``block_size`` is given, blocks hold as many rows as fit in
+    ``block_memory`` bytes, so peak memory does not grow with the catalog.
+    """
+    n = similarity.shape[0]
+    block_size = block_size or block_rows(n, block_memory)
+    all_indices, all_scores = [], []
+    for start in range(0, n, block_size):
+        idx, sc = top_k_rows(similarity[start:start + block_size], k, row_offset=start)
+        all_indices.append(idx)
+        all_scores.append(sc)
+    return from_top_k(np.vstack(all_indices), np.vstack(all_scores))
+
+
+def ranking_agreement(similarity, index, n_trials=50, likes_per_trial=3, top_n=10, seed=42):
+    """Measure how closely sparse scoring reproduces dense scoring.
+
+    For random sets of liked movies, compares the top-N of the weighted dense
+    row-sum with the top-N computed from the neighbour index and returns the
+    mean overlap fraction (1.0 means identical recommendation sets).
+    """
+    rng = np.random.default_rng(seed)
+    n = similarity.shape[0]
+    if n <= likes_per_trial + top_n:
+        return 1.0
+
+    overlaps = []
+    for _ in range(n_trials):
+        liked = rng.choice(n, size=likes_per_trial, replace=False)
+        weights = (len(liked) - np.arange(len(liked))) / len(liked)
+
+        dense = np.zeros(n, dtype=np.float64)
+        sparse = np.zeros(n, dtype=np.float64)
+        for w, idx in zip(weights, liked):
+            dense += w * np.asarray(similarity[idx], dtype=np.float64)
+            cols, vals = index.row(idx)
+            sparse[cols] += w * vals
+        dense[liked] = -np.inf
+        sparse[liked] = -np.inf
+
+        dense_top = set(np.argsort(-dense)[:top_n])
+        sparse_top = set(np.argsort(-sparse)[:top_n])
+        overlaps.append(len(dense_top & sparse_top) / top_n)
+
+    return float(np.mean(overlaps))
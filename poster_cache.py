@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import threading
+import time
+from ttl_cache import TTLCache
+
+POSTER_CACHE_PATH = os.environ.get("POSTER_CACHE_PATH", os.path.join("cache", "posters.db"))
+
+# Poster URLs almost never change; "no poster" answers are re-checked sooner
+POSTER_TTL = 7 * 24 * 3600
+MISSING_POSTER_TTL = 24 * 3600
+MEMORY_CACHE_SIZE = 4096
+
+
+class PosterCache:
+    """Persistent (movie_id, size) -> poster URL cache with an in-memory LRU in front.
+
+    Entries live in SQLite (WAL mode, so several app processes can share the
+    file) with an absolute expiry time. Negative results ("No Poster") are
+    cached with a shorter TTL.
+    """
+
+    def __init__(self, path=POSTER_CACHE_PATH, ttl=POSTER_TTL, missing_ttl=MISSING_POSTER_TTL,
+                 memory_size=MEMORY_CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl)
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS posters ("
+            " movie_id INTEGER NOT NULL, size TEXT NOT NULL, url TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, PRIMARY KEY (movie_id, size))"
+        )
+        self._conn.commit()
+
+    def get_many(self, movie_ids, size):
+        """Return {movie_id: url} for every id cached and not expired"""
+        found = {}
+        missing = []
+        for movie_id in movie_ids:
+            url = self.memory.get((movie_id, size))
+            if url is not None:
+                found[movie_id] = url
+            else:
+                missing.append(movie_id)
+        if not missing:
+            return found
+
+        now = time.time()
+        rows = []
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                rows += self._conn.execute(
+                    f"SELECT movie_id, url, expires_at FROM posters"
+                    f" WHERE size = ? AND expires_at > ? AND movie_id IN ({','.join('?' * len(batch))})",
+                    [size, now, *batch],
+                ).fetchall()
+        for movie_id, url, expires_at in rows:
+            self.memory.set((movie_id, size), url, ttl=expires_at - now)
+            found[movie_id] = url
+        return found
+
+    def get(self, movie_id, size):
+        return self.get_many([movie_id], size).get(movie_id)
+
+    def put_many(self, entries, size):
+        """Store (movie_id, url, is_missing) entries"""
+        now = time.time()
+        rows = []
+        for movie_id, url, is_missing in entries:
+            ttl = self.missing_ttl if is_missing else self.ttl
+            self.memory.set((movie_id, size), url, ttl=ttl)
+            rows.append((movie_id, size, url, now + ttl))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO posters VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def put(self, movie_id, size, url, is_missing=False):
+        self.put_many([(movie_id, url, is_missing)], size)
+
+    def purge_expired(self):
+        """Delete expired rows from the database file"""
+        with self._lock:
+            self._conn.execute("DELETE FROM posters WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            (rows,) = self._conn.execute("SELECT COUNT(*) FROM posters").fetchone()
+        return {'persistent_entries': rows, 'memory': self.memory.stats()}
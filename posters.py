@@ -0,0 +1,176 @@
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import streamlit as st
+from circuit_breaker import CircuitBreaker
+from http_client import get_http_client
+from poster_cache import PosterCache
+
+PLACEHOLDER_BASE = "https://via.placeholder.com/500x750"
+
+# Upper bound on concurrent TMDB requests per grid
+MAX_POSTER_WORKERS = 8
+
+# Posters are cosmetic: fail fast with a single retry rather than stall the page
+TMDB_TIMEOUT = (3.05, 5)
+TMDB_RETRIES = 1
+
+# request_poster outcomes; only "unavailable" counts against TMDB's health
+POSTER_FOUND = "found"
+POSTER_MISSING = "missing"
+POSTER_ERROR = "error"
+POSTER_UNAVAILABLE = "unavailable"
+
+# Stop calling TMDB after this many consecutive timeouts/5xx, probe again after the cooldown
+TMDB_FAILURE_THRESHOLD = 5
+TMDB_RESET_TIMEOUT = 30.0
+tmdb_breaker = CircuitBreaker("tmdb", failure_threshold=TMDB_FAILURE_THRESHOLD,
+                              reset_timeout=TMDB_RESET_TIMEOUT)
+
+
+def get_tmdb_api_key():
+    return st.secrets.get("tmdb_api_key", "")
+
+
+@st.cache_resource(show_spinner=False)
+def get_poster_cache():
+    """Process-wide persistent poster cache"""
+    return PosterCache()
+
+
+def get_tmdb_client():
+    return get_http_client("tmdb", timeout=TMDB_TIMEOUT, retries=TMDB_RETRIES,
+                           max_per_host=MAX_POSTER_WORKERS)
+
+
+def request_poster(movie_id, size, api_key):
+    """Look up one poster on TMDB; returns (url, status) with status found, missing, error or unavailable"""
+    placeholder_base = PLACEHOLDER_BASE
+
+    try:
+        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={api_key}&language=en-US"
+        response = get_tmdb_client().get(url)
+        
+        if response.status_code == 429 or response.status_code >= 500:
+            return f"{placeholder_base}?text=TMDB+Error+{response.status_code}", POSTER_UNAVAILABLE
+
+        if response.status_code != 200:
+            return f"{placeholder_base}?text=TMDB+Error+{response.status_code}", POSTER_ERROR
+
+        data = response.json()
+        poster_path = data.get('poster_path')
+        
+        if not poster_path:
+            return f"{placeholder_base}?text=No+Poster", POSTER_MISSING
+
+        return f"https://image.tmdb.org/t/p/{size}/{poster_path}", POSTER_FOUND
+    
+    except requests.exceptions.Timeout:
+        return f"{placeholder_base}?text=Timeout", POSTER_UNAVAILABLE
+
+    except requests.exceptions.RequestException as e:
+        # Optional: log the error for debugging
+        print(f"[Poster Fetch Error] movie_id={movie_id}: {e}")
+        return f"{placeholder_base}?text=Fetch+Error", POSTER_UNAVAILABLE
+
+    except Exception as e:
+        print(f"[Unexpected Error] movie_id={movie_id}: {e}")
+        return f"{placeholder_base}?text=Unknown+Error", POSTER_ERROR
+
+
+def guarded_request_poster(movie_id, size, api_key):
+    """request_poster behind the TMDB circuit breaker; an open circuit answers with a placeholder"""
+    if not tmdb_breaker.allow_request():
+        return f"{PLACEHOLDER_BASE}?text=TMDB+Unavailable", POSTER_UNAVAILABLE
+
+    url, status = request_poster(movie_id, size, api_key)
+    if status == POSTER_UNAVAILABLE:
+        tmdb_breaker.record_failure()
+    else:
+        tmdb_breaker.record_success()
+    return url, status
+
+
+def poster_health():
+    """Circuit breaker state and cache counters for the debug sidebar"""
+    health = {'tmdb': tmdb_breaker.snapshot()}
+    try:
+        health['cache'] = get_poster_cache().stats()
+    except Exception as e:
+        health['cache'] = {'error': str(e)}
+    return health
+
+
+def poster_url(poster_path, size='w500'):
+    """Format a known TMDB poster path ("" means TMDB has no poster)"""
+    if not poster_path:
+        return f"{PLACEHOLDER_BASE}?text=No+Poster"
+    return f"https://image.tmdb.org/t/p/{size}/{poster_path}"
+
+
+def fetch_poster(movie_id, size='w500', known_paths=None):
+    """Fetches poster URL from TMDB using movie_id with fallback and timeout handling."""
+    return fetch_posters([movie_id], size, known_paths=known_paths)[0]
+
+
+def fetch_posters(movie_ids, size='w500', max_workers=MAX_POSTER_WORKERS, known_paths=None):
+    """Fetch posters for a whole grid, keeping input order.
+
+    ``known_paths`` maps a movie id to its prefetched poster path (or None);
+    those posters are a pure string format. Cached posters (memory, then
+    SQLite) are served without touching the network; the rest are fetched
+    concurrently, so a grid takes about as long as its slowest single fetch.
+    Any item that fails falls back to a placeholder without affecting the
+    others. Found and "No Poster" answers are cached, transient errors are not.
+    While the TMDB circuit breaker is open, uncached posters get a placeholder
+    straight away instead of waiting on timeouts.
+    """
+    movie_ids = [int(mid) for mid in movie_ids]
+    if not movie_ids:
+        return []
+
+    posters = {}
+    if known_paths is not None:
+        for mid in movie_ids:
+            path = known_paths(mid)
+            if path is not None:
+                posters[mid] = poster_url(path, size)
+        if len(posters) == len(set(movie_ids)):
+            return [posters[mid] for mid in movie_ids]
+
+    # The cache is an optimization: if SQLite can't be opened or read, fetch from the network
+    try:
+        cache = get_poster_cache()
+        posters.update(cache.get_many([mid for mid in movie_ids if mid not in posters], size))
+    except Exception as e:
+        print(f"[Poster Cache Error] {e}")
+        cache = None
+    misses = list(dict.fromkeys(mid for mid in movie_ids if mid not in posters))
+    if not misses:
+        return [posters[mid] for mid in movie_ids]
+
+    # Read secrets once on the calling (script) thread
+    api_key = get_tmdb_api_key()
+    if not api_key:
+        return [posters.get(mid, f"{PLACEHOLDER_BASE}?text=No+API+Key") for mid in movie_ids]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as executor:
+        futures = [executor.submit(guarded_request_poster, mid, size, api_key) for mid in misses]
+
+    fetched = []
+    for mid, future in zip(misses, futures):
+        try:
+            url, status = future.result()
+        except Exception as e:
+            print(f"[Unexpected Error] movie_id={mid}: {e}")
+            url, status = f"{PLACEHOLDER_BASE}?text=Unknown+Error", POSTER_ERROR
+        posters[mid] = url
+        if status in (POSTER_FOUND, POSTER_MISSING):
+            fetched.append((mid, url, status == POSTER_MISSING))
+
+    if cache is not None:
+        try:
+            cache.put_many(fetched, size)
+        except Exception as e:
+            print(f"[Poster Cache Error] {e}")
+
+    return [posters[mid] for mid in movie_ids]
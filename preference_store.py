@@ -0,0 +1,270 @@
+import abc
+import copy
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from feedback_log import replay
+
+# "firestore" (default) or "sqlite"; SQLite needs no credentials, which suits
+# local runs, benchmarks and single-host deployments
+PREFERENCE_STORE = os.environ.get("PREFERENCE_STORE", "firestore")
+PREFERENCE_DB_PATH = os.environ.get("PREFERENCE_DB_PATH", os.path.join("cache", "preferences.db"))
+
+FEEDBACK_EVENTS_COLLECTION = 'feedback_events'
+FIRESTORE_BATCH_LIMIT = 500  # operations per batched write
+
+
+def merge_fields(target, data):
+    """Apply ``data`` to ``target`` the way Firestore's set(merge=True) does.
+
+    Non-empty nested maps merge; an empty map replaces the field.
+    """
+    for key, value in data.items():
+        if isinstance(value, dict) and value and isinstance(target.get(key), dict):
+            merge_fields(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+class PreferenceStore(abc.ABC):
+    """Where user documents and their append-only feedback events are kept.
+
+    A user's current state is their document with every event recorded
+    since the last ``compact`` replayed over it (see feedback_log).
+    """
+
+    @abc.abstractmethod
+    def load(self, user_id):
+        """Return (document or None, number of events replayed into it)"""
+
+    def get(self, user_id):
+        return self.load(user_id)[0]
+
+    @abc.abstractmethod
+    def save(self, user_id, fields):
+        """Merge ``fields`` into the user's document"""
+
+    @abc.abstractmethod
+    def append_feedback(self, user_id, events, fields=None):
+        """Append feedback events (and merge ``fields``) in one write"""
+
+    @abc.abstractmethod
+    def compact(self, user_id):
+        """Fold the user's events into their document; returns how many were folded"""
+
+    @abc.abstractmethod
+    def export(self):
+        """Yield (user_id, document) for every user, events replayed"""
+
+
+# === Firestore ===
+
+def initialize_firebase():
+    """Initialize Firebase Admin once using secrets"""
+    import firebase_admin
+    from firebase_admin import credentials
+    import streamlit as st
+
+    if not firebase_admin._apps:
+        # Get Firebase service account from secrets
+        firebase_secrets = st.secrets["firebase"]["service_account"]
+
+        # Convert the secrets to a dictionary for credentials
+        cred_dict = {
+            "type": firebase_secrets["type"],
+            "project_id": firebase_secrets["project_id"],
+            "private_key_id": firebase_secrets["private_key_id"],
+            "private_key": firebase_secrets["private_key"].replace("\\n", "\n"),
+            "client_email": firebase_secrets["client_email"],
+            "client_id": firebase_secrets["client_id"],
+            "auth_uri": firebase_secrets["auth_uri"],
+            "token_uri": firebase_secrets["token_uri"],
+            "auth_provider_x509_cert_url": firebase_secrets["auth_provider_x509_cert_url"],
+            "client_x509_cert_url": firebase_secrets["client_x509_cert_url"]
+        }
+
+        cred = credentials.Certificate(cred_dict)
+        firebase_admin.initialize_app(cred)
+
+
+def _event_id(stamp, position):
+    """Event document id that sorts by append time, then position in the batch"""
+    return f"{stamp:020d}-{position:04d}-{uuid.uuid4().hex[:8]}"
+
+
+class FirestorePreferenceStore(PreferenceStore):
+    """``users/{uid}`` snapshot documents with a ``feedback_events`` subcollection.
+
+    Every event still in the subcollection is unfolded and replayed on
+    load, in document id order (ids sort by append time, see ``_event_id``,
+    so events written together never tie): ``compact`` writes the snapshot
+    and deletes exactly the events it folded in one transaction.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from firebase_admin import firestore
+            initialize_firebase()
+            client = firestore.client()
+        self.db = client
+
+    def _user_ref(self, user_id):
+        return self.db.collection('users').document(user_id)
+
+    def _events_ref(self, user_id):
+        return self._user_ref(user_id).collection(FEEDBACK_EVENTS_COLLECTION)
+
+    def _read(self, user_id, transaction=None, limit=None):
+        """(document with events replayed, event snapshots), read inside ``transaction`` if given"""
+        doc = self._user_ref(user_id).get(transaction=transaction)
+        data = doc.to_dict() if doc.exists else None
+        query = self._events_ref(user_id).order_by('__name__')
+        if limit is not None:
+            query = query.limit(limit)
+        events = list(query.stream(transaction=transaction))
+        if events:
+            data = replay(data if data is not None else {}, (e.to_dict() for e in events))
+        return data, events
+
+    def load(self, user_id):
+        data, events = self._read(user_id)
+        return data, len(events)
+
+    def save(self, user_id, fields):
+        self._user_ref(user_id).set(fields, merge=True)
+
+    def append_feedback(self, user_id, events, fields=None):
+        stamp = time.time_ns()
+        # Always touch the parent: Firestore doesn't list users whose document was never written
+        writes = [(self._user_ref(user_id), fields or {}, True)]
+        writes += [(self._events_ref(user_id).document(_event_id(stamp, i)), event, False)
+                   for i, event in enumerate(events)]
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for ref, data, merge in writes[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(ref, data, merge=merge)
+            batch.commit()
+
+    def compact(self, user_id):
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def fold(transaction):
+            # One transaction holds at most 500 writes: the snapshot plus the deleted events
+            data, events = self._read(user_id, transaction, limit=FIRESTORE_BATCH_LIMIT - 1)
+            if not events:
+                return 0
+            # Replace the document so feedback entries removed by events don't survive the merge
+            transaction.set(self._user_ref(user_id), data)
+            for event in events:
+                transaction.delete(event.reference)
+            return len(events)
+
+        return fold(self.db.transaction())
+
+    def export(self):
+        for doc in self.db.collection('users').stream():
+            yield doc.id, self.get(doc.id)
+
+
+# === SQLite ===
+
+class SQLitePreferenceStore(PreferenceStore):
+    """User documents as JSON rows and feedback events in insertion order.
+
+    WAL mode lets several app processes share the file; each call is one
+    short transaction, and loading a user reads two indexed ranges.
+    """
+
+    def __init__(self, path=PREFERENCE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feedback_events ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, event TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS feedback_events_user ON feedback_events (user_id, seq)")
+
+    def _read(self, user_id):
+        row = self._conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        data = json.loads(row[0]) if row else None
+        events = self._conn.execute(
+            "SELECT seq, event FROM feedback_events WHERE user_id = ? ORDER BY seq", (user_id,)
+        ).fetchall()
+        if events:
+            data = replay(data if data is not None else {}, (json.loads(event) for _, event in events))
+        return data, events
+
+    def _write(self, user_id, data):
+        self._conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (user_id, json.dumps(data)))
+
+    def _merge(self, user_id, fields):
+        row = self._conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        self._write(user_id, merge_fields(json.loads(row[0]) if row else {}, fields))
+
+    @contextmanager
+    def _transaction(self, mode="IMMEDIATE"):
+        # IMMEDIATE takes the write lock up front, so read-modify-write can't interleave;
+        # DEFERRED is enough for a consistent read of the document and its events
+        with self._lock:
+            self._conn.execute(f"BEGIN {mode}")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def load(self, user_id):
+        with self._transaction("DEFERRED"):
+            data, events = self._read(user_id)
+        return data, len(events)
+
+    def save(self, user_id, fields):
+        with self._transaction():
+            self._merge(user_id, fields)
+
+    def append_feedback(self, user_id, events, fields=None):
+        with self._transaction():
+            if fields:
+                self._merge(user_id, fields)
+            self._conn.executemany("INSERT INTO feedback_events (user_id, event) VALUES (?, ?)",
+                                   [(user_id, json.dumps(event)) for event in events])
+
+    def compact(self, user_id):
+        with self._transaction():
+            data, events = self._read(user_id)
+            if not events:
+                return 0
+            self._write(user_id, data)
+            self._conn.execute("DELETE FROM feedback_events WHERE user_id = ? AND seq <= ?",
+                               (user_id, events[-1][0]))
+        return len(events)
+
+    def export(self):
+        with self._lock:
+            user_ids = [row[0] for row in self._conn.execute(
+                "SELECT user_id FROM users UNION SELECT user_id FROM feedback_events")]
+        for user_id in user_ids:
+            yield user_id, self.get(user_id)
+
+
+def create_preference_store(kind=PREFERENCE_STORE):
+    """The store selected by PREFERENCE_STORE ("firestore" or "sqlite")"""
+    if kind == "sqlite":
+        return SQLitePreferenceStore()
+    if kind == "firestore":
+        return FirestorePreferenceStore()
+    raise ValueError(f"Unknown PREFERENCE_STORE {kind!r}; expected 'firestore' or 'sqlite'")
@@ -0,0 +1,145 @@
+"""Resolve TMDB poster paths for the whole catalog and bake them into the model.
+
+Run after build_model.py (or with ``build_model.py --prefetch-posters``):
+
+    python prefetch_posters.py --api-key YOUR_TMDB_KEY --workers 16 --rate 35
+
+Progress is appended to a checkpoint file in the model directory, so an
+interrupted or partially failed run resumes where it stopped. Movies whose
+lookup failed keep no poster path and are retried on the next run.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from artifacts import read_manifest, read_strings, write_string_column
+from http_client import HttpClient
+
+TMDB_API_BASE = "https://api.themoviedb.org/3"
+CHECKPOINT_FILE = "poster_paths.checkpoint.jsonl"
+
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 30  # requests per second, under TMDB's documented limit
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing ``rate`` calls per second on average"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def resolve_poster_path(client, movie_id, api_key, api_base=TMDB_API_BASE):
+    """Return the movie's poster path, "" if TMDB has none, or raise on failure"""
+    response = client.get(f"{api_base}/movie/{movie_id}",
+                          params={"api_key": api_key, "language": "en-US"})
+    if response.status_code == 404:
+        return ""
+    response.raise_for_status()
+    return response.json().get('poster_path') or ""
+
+
+def load_checkpoint(path):
+    """Return {movie_id: poster_path} already resolved by earlier runs"""
+    resolved = {}
+    if not os.path.exists(path):
+        return resolved
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                resolved[int(entry['movie_id'])] = entry['poster_path']
+            except (ValueError, KeyError):
+                continue  # torn last line from an interrupted run
+    return resolved
+
+
+def prefetch_poster_paths(model_dir="model", api_key="", api_base=TMDB_API_BASE,
+                          workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, timeout=10):
+    """Resolve poster paths for every catalog movie and store them as a model column.
+
+    Returns (resolved, failed) counts for this run.
+    """
+    manifest = read_manifest(model_dir)
+    strings = read_strings(model_dir, manifest)
+    movie_ids = np.load(os.path.join(model_dir, manifest["arrays"]["movie_ids"]["file"])).tolist()
+
+    # Seed from paths baked by a previous run, then from the checkpoint
+    checkpoint_path = os.path.join(model_dir, CHECKPOINT_FILE)
+    resolved = {mid: path for mid, path in zip(movie_ids, strings.get('poster_path', []))
+                if path is not None}
+    resolved.update(load_checkpoint(checkpoint_path))
+
+    todo = [mid for mid in dict.fromkeys(movie_ids) if mid not in resolved]
+    print(f"Posters: {len(movie_ids) - len(todo)} known, {len(todo)} to resolve")
+
+    limiter = RateLimiter(rate)
+    client = HttpClient(timeout=timeout, max_per_host=workers)
+    failed = 0
+
+    def task(movie_id):
+        limiter.acquire()
+        return resolve_poster_path(client, movie_id, api_key, api_base)
+
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(task, mid): mid for mid in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            movie_id = futures[future]
+            try:
+                path = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[Poster Prefetch Error] movie_id={movie_id}: {e}")
+                continue
+            resolved[movie_id] = path
+            checkpoint.write(json.dumps({"movie_id": movie_id, "poster_path": path}) + "\n")
+            checkpoint.flush()
+            if done % 500 == 0:
+                print(f"  {done}/{len(todo)} resolved")
+    client.close()
+
+    stored = sum(mid in resolved for mid in movie_ids)
+    write_string_column(model_dir, 'poster_path', [resolved.get(mid) for mid in movie_ids],
+                        poster_paths_resolved=stored)
+    if failed == 0 and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    print(f"✅ Poster paths stored for {stored}/{len(movie_ids)} movies ({failed} lookups failed)")
+    return len(todo) - failed, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bake TMDB poster paths into the model")
+    parser.add_argument("--model-dir", default="model")
+    parser.add_argument("--api-key", default=os.environ.get("TMDB_API_KEY", ""),
+                        help="TMDB API key (default: $TMDB_API_KEY)")
+    parser.add_argument("--api-base", default=TMDB_API_BASE,
+                        help="TMDB API base URL, e.g. a local stub server for testing")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="max requests per second")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("a TMDB API key is required (--api-key or TMDB_API_KEY)")
+
+    prefetch_poster_paths(args.model_dir, args.api_key, args.api_base, args.workers, args.rate)
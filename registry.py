@@ -0,0 +1,109 @@
+import os
+import pickle
+import pandas as pd
+import streamlit as st
+from artifacts import MANIFEST_FILE, open_artifacts
+from catalog import MovieCatalog
+from neighbors import build_neighbor_index
+from text_search import BM25Index
+
+# Legacy model files, used when the model directory has no manifest
+MOVIE_PKL = "movie_list.pkl"
+SIMILARITY_PKL = "similarity.pkl"
+
+
+def _freeze(array):
+    """Mark an array read-only so shared model data cannot be mutated by a session"""
+    array.flags.writeable = False
+    return array
+
+
+def model_available(model_dir):
+    """True if ``model_dir`` holds a manifest model or a legacy pickle model"""
+    if os.path.exists(os.path.join(model_dir, MANIFEST_FILE)):
+        return True
+    return (os.path.exists(os.path.join(model_dir, MOVIE_PKL))
+            and os.path.exists(os.path.join(model_dir, SIMILARITY_PKL)))
+
+
+def _load_legacy_movies(model_dir):
+    """Load and validate the pickled movie DataFrame"""
+    movies = pickle.load(open(os.path.join(model_dir, MOVIE_PKL), 'rb'))
+
+    if not isinstance(movies, pd.DataFrame):
+        raise ValueError("Invalid movie data format. Expected DataFrame.")
+
+    required_columns = ['movie_id', 'title', 'genres']
+    missing_columns = [col for col in required_columns if col not in movies.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns in movie data: {', '.join(missing_columns)}")
+
+    if not pd.api.types.is_numeric_dtype(movies['movie_id']):
+        raise ValueError("'movie_id' column must be numeric")
+
+    return movies.reset_index(drop=True)
+
+
+def _load_legacy_neighbors(model_dir):
+    """Reduce the pickled dense similarity matrix to a top-K neighbor index"""
+    return build_neighbor_index(pickle.load(open(os.path.join(model_dir, SIMILARITY_PKL), 'rb')))
+
+
+class ModelRegistry:
+    """Single process-wide owner of the movie catalog and neighbor index.
+
+    Sessions get references to the same read-only objects, so memory stays
+    flat no matter how many users are connected.
+    """
+
+    def __init__(self, catalog, neighbors, source):
+        self.catalog = catalog
+        self.neighbors = neighbors
+        self.source = source
+
+        for array in (neighbors.indptr, neighbors.indices, neighbors.scores,
+                      catalog.titles, catalog.movie_ids, catalog.genre_matrix, catalog.poster_paths):
+            if array is not None:
+                _freeze(array)
+
+    @classmethod
+    def load(cls, model_dir):
+        if os.path.exists(os.path.join(model_dir, MANIFEST_FILE)):
+            artifacts = open_artifacts(model_dir)
+            movies = artifacts.movies
+            catalog = MovieCatalog(movies, artifacts.genre_vocab, artifacts.genre_matrix,
+                                   version=artifacts.catalog_version, text_index=artifacts.text_index)
+            return cls(catalog, artifacts.neighbors, source="manifest")
+
+        movies = _load_legacy_movies(model_dir)
+        # Pickled models keep their tags, so full-text search can be indexed at load time
+        text_index = BM25Index.build(movies['tags'].astype(str)) if 'tags' in movies.columns else None
+        catalog = MovieCatalog(movies, text_index=text_index)
+        return cls(catalog, _load_legacy_neighbors(model_dir), source="pickle")
+
+    @property
+    def movies(self):
+        return self.catalog.movies
+
+    @property
+    def version(self):
+        return f"{self.catalog.version[:12]}-{self.neighbors.version[:12]}"
+
+    def memory_usage(self):
+        """Approximate footprint in bytes of everything the registry holds"""
+        catalog = self.catalog
+        usage = {
+            'movies_frame': int(self.movies.memory_usage(deep=True).sum()),
+            'lookup_tables': catalog.nbytes,
+            'text_index': catalog.text_index.nbytes if catalog.text_index is not None else 0,
+            'genre_matrix': catalog.genre_matrix.nbytes,
+            'neighbor_index': self.neighbors.nbytes,
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_registry(model_dir):
+    """Load the model once per process and share it with every session"""
+    return ModelRegistry.load(model_dir)
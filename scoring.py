@@ -0,0 +1,74 @@
+import numpy as np
+
+
+def like_weights(n_likes):
+    """Weights for liked movies in order, newer likes (earlier in the list) carry more weight"""
+    return (n_likes - np.arange(n_likes)) / n_likes
+
+
+def top_n_rows(scores, valid, n):
+    """Return (rows, scores) of the ``n`` best valid entries, highest score first, ties by row"""
+    candidates = np.flatnonzero(valid)
+    if len(candidates) == 0 or n <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    candidate_scores = scores[candidates]
+    if len(candidates) > n:
+        # Keep every row tied with the n-th score so ties resolve by row below, not by partition order
+        kth = np.partition(candidate_scores, len(candidates) - n)[len(candidates) - n]
+        keep = candidate_scores >= kth
+        candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+
+    order = np.lexsort((candidates, -candidate_scores))[:n]
+    return candidates[order], candidate_scores[order]
+
+
+def genre_masks(genre_matrix, liked_rows, disliked_rows=(), n_top=3):
+    """Return (boost_mask, exclude_mask) from a multi-hot genre matrix.
+
+    Movies sharing one of the ``n_top`` most frequent genres among the liked
+    rows are boosted; movies sharing any genre of a disliked row are excluded.
+    """
+    liked_counts = genre_matrix[np.asarray(liked_rows, dtype=np.int64)].sum(axis=0, dtype=np.int64)
+    top = np.argsort(-liked_counts, kind='stable')[:n_top]
+    top_genres = np.zeros(genre_matrix.shape[1], dtype=np.uint8)
+    top_genres[top[liked_counts[top] > 0]] = 1
+
+    disliked_genres = genre_matrix[np.asarray(disliked_rows, dtype=np.int64)].any(axis=0).astype(np.uint8)
+
+    return genre_matrix @ top_genres > 0, genre_matrix @ disliked_genres > 0
+
+
+def content_scores(index, liked_rows):
+    """Weighted neighbour score vector over all movies for the liked rows"""
+    liked_rows = np.asarray(liked_rows, dtype=np.int64)
+    return index.weighted_sum(liked_rows, like_weights(len(liked_rows)))
+
+
+def rank_scores(scores, liked_rows, disliked_rows=(), boost_mask=None, exclude_mask=None,
+                genre_boost=0.25, top_n=10):
+    """Apply exclusion and genre boost masks to a score vector and return the top-N.
+
+    Every movie is a candidate, including those with a zero content score,
+    so sparse profiles still fill ``top_n``. Liked, disliked and
+    ``exclude_mask`` rows are dropped and ``boost_mask`` rows are multiplied
+    by ``1 + genre_boost``. Returns (rows, scores), highest score first.
+    """
+    valid = np.ones(len(scores), dtype=bool)
+    valid[np.asarray(liked_rows, dtype=np.int64)] = False
+    valid[np.asarray(disliked_rows, dtype=np.int64)] = False
+    if exclude_mask is not None:
+        valid &= ~exclude_mask
+
+    if boost_mask is not None:
+        scores = np.where(boost_mask, scores * (1 + genre_boost), scores)
+
+    return top_n_rows(scores, valid, top_n)
+
+
+def score_candidates(index, liked_rows, disliked_rows=(), boost_mask=None, exclude_mask=None,
+                     genre_boost=0.25, top_n=10):
+    """Hybrid content scoring over a NeighborIndex, see ``rank_scores``"""
+    return rank_scores(content_scores(index, liked_rows), liked_rows, disliked_rows,
+                       boost_mask=boost_mask, exclude_mask=exclude_mask,
+                       genre_boost=genre_boost, top_n=top_n)
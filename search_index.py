@@ -0,0 +1,185 @@
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from heapq import nlargest
+import numpy as np
+
+# Sorts after every real character, closing the bisect range for a prefix
+_PREFIX_END = "\U0010ffff"
+
+
+class PrefixIndex:
+    """Lowercase titles in sorted order for O(log N + k) prefix lookups.
+
+    Ties keep catalog row order, so results are deterministic. Rows are
+    returned alphabetically by title, the usual order for autocomplete.
+    """
+
+    def __init__(self, titles):
+        lowered = [str(title).lower() for title in titles]
+        order = sorted(range(len(lowered)), key=lowered.__getitem__)
+        self.keys = [lowered[row] for row in order]
+        self.rows = np.asarray(order, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def span(self, prefix, lo=0, hi=None):
+        """(lo, hi) positions in ``keys`` of titles starting with ``prefix``.
+
+        Passing the span of a shorter prefix of ``prefix`` narrows the search to it.
+        """
+        hi = len(self.keys) if hi is None else hi
+        lo = bisect_left(self.keys, prefix, lo, hi)
+        hi = bisect_left(self.keys, prefix + _PREFIX_END, lo, hi)
+        return lo, hi
+
+    def count(self, prefix):
+        lo, hi = self.span(prefix)
+        return hi - lo
+
+    def rows_with_prefix(self, prefix, limit=None):
+        """Catalog rows whose lowercase title starts with ``prefix`` (lowercase)"""
+        lo, hi = self.span(prefix)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.rows[lo:hi].tolist()
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + sum(len(key) for key in self.keys)
+
+
+# Exact SequenceMatcher scoring is applied to at most this many trigram candidates
+MAX_FUZZY_CANDIDATES = 400
+
+
+def trigrams(text):
+    """Character trigrams of ``text`` padded so short strings and word edges count"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to the strings containing them.
+
+    ``close_matches`` approximates ``difflib.get_close_matches``: the index
+    narrows the catalog to at most MAX_FUZZY_CANDIDATES strings of compatible
+    length that share the most trigrams with the query, and only those are
+    scored with difflib's SequenceMatcher ratio and cutoff. Strings sharing
+    no trigram with the query are never returned, and when the candidate set
+    is truncated a close match can be missed, so results agree with difflib's
+    on the best match but only approximately on the rest of the top n.
+
+    ``containing`` answers literal substring queries by intersecting the
+    posting lists of the query's trigrams and verifying the survivors;
+    ``narrow_candidates`` refines that set when the query grows.
+    """
+
+    def __init__(self, strings):
+        self.strings = list(strings)
+        self.lengths = np.fromiter((len(s) for s in self.strings), dtype=np.int32, count=len(self.strings))
+
+        postings = {}
+        for position, text in enumerate(self.strings):
+            for gram in trigrams(text):
+                postings.setdefault(gram, []).append(position)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        # Sorted trigrams, so queries shorter than three characters can bisect for their extensions
+        self.grams = sorted(self.postings)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def candidates(self, query, cutoff=0.6, limit=MAX_FUZZY_CANDIDATES):
+        """Positions of the strings sharing the most trigrams with ``query``"""
+        lists = [self.postings[gram] for gram in trigrams(query) if gram in self.postings]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.strings))
+
+        # ratio = 2*M / (len(a) + len(b)) can only reach cutoff if the lengths are close
+        length = len(query)
+        if cutoff > 0:
+            shared[self.lengths < length * cutoff / (2 - cutoff)] = 0
+            shared[self.lengths > length * (2 - cutoff) / cutoff] = 0
+
+        hits = np.flatnonzero(shared)
+        if len(hits) > limit:
+            # Dice-style overlap, so long titles sharing many trigrams don't crowd out close ones
+            overlap = shared[hits] / (self.lengths[hits] + length + 2)
+            hits = hits[np.argpartition(overlap, -limit)[-limit:]]
+        return hits
+
+    def substring_candidates(self, query):
+        """Sorted positions of every string that may contain ``query`` (a superset; see ``verify``)"""
+        empty = np.empty(0, dtype=np.int32)
+        if not query:
+            return empty
+        if len(query) < 3:
+            if len(query) == 1:
+                lists = [self.postings[gram] for gram in self.grams if query in gram]
+            else:
+                # Every occurrence is followed by at least the trailing pad, so
+                # it starts some indexed trigram
+                lo = bisect_left(self.grams, query)
+                hi = bisect_left(self.grams, query + _PREFIX_END, lo)
+                lists = [self.postings[gram] for gram in self.grams[lo:hi]]
+            return np.unique(np.concatenate(lists)) if lists else empty
+
+        grams = {query[i:i + 3] for i in range(len(query) - 2)}
+        if not all(gram in self.postings for gram in grams):
+            return empty
+        lists = sorted((self.postings[gram] for gram in grams), key=len)
+        hits = lists[0]
+        for ids in lists[1:]:
+            hits = np.intersect1d(hits, ids, assume_unique=True)
+            if not len(hits):
+                break
+        return hits
+
+    def narrow_candidates(self, candidates, query, previous):
+        """Candidates for ``query`` from the candidates of ``previous``, a substring of it.
+
+        Only the trigrams ``query`` adds are checked, each with a binary
+        search per candidate, so the cost follows the candidate set rather
+        than the posting lists.
+        """
+        if len(previous) < 3:
+            return self.substring_candidates(query) if len(query) >= 3 else candidates
+        grams = {query[i:i + 3] for i in range(len(query) - 2)}
+        grams -= {previous[i:i + 3] for i in range(len(previous) - 2)}
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None or not len(candidates):
+                return np.empty(0, dtype=np.int32)
+            slots = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+            candidates = candidates[ids[slots] == candidates]
+        return candidates
+
+    def verify(self, candidates, query):
+        """Yield the candidate positions whose string really contains ``query``"""
+        # Trigrams only prove the pieces occur; padding and order still need checking
+        for position in candidates.tolist():
+            if query in self.strings[position]:
+                yield position
+
+    def containing(self, query):
+        """Yield positions of strings containing ``query`` as a literal substring, in index order"""
+        return self.verify(self.substring_candidates(query), query)
+
+    def close_matches(self, query, n=3, cutoff=0.6):
+        """Best ``n`` strings scoring at least ``cutoff`` against ``query``, best first"""
+        scored = []
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        for position in self.candidates(query, cutoff):
+            text = self.strings[position]
+            matcher.set_seq1(text)
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff \
+                    and matcher.ratio() >= cutoff:
+                scored.append((matcher.ratio(), text))
+        return [text for _, text in nlargest(n, scored)]
+
+    @property
+    def nbytes(self):
+        return self.lengths.nbytes + sum(ids.nbytes for ids in self.postings.values())
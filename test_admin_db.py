@@ -0,0 +1,101 @@
+import pytest
+import admin_db
+from feedback_log import DISLIKE, LIKE, UNLIKE
+from preference_store import SQLitePreferenceStore
+
+
+class RacingStore(SQLitePreferenceStore):
+    """SQLite store that can let the queued writes land while a load is in progress"""
+
+    race = False
+    unavailable = False
+
+    def append_feedback(self, user_id, events, fields=None):
+        if self.unavailable:
+            raise IOError("store unavailable")
+        super().append_feedback(user_id, events, fields)
+
+    def load(self, user_id):
+        result = super().load(user_id)
+        if self.race:
+            self.race = False
+            admin_db._user_writes.drain()
+        return result
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = RacingStore(str(tmp_path / "preferences.db"))
+    monkeypatch.setattr(admin_db, '_store', store)
+    admin_db._user_writes.drain()
+    admin_db._user_cache.clear()
+    yield store
+    admin_db._user_writes.drain()
+    admin_db._user_cache.clear()
+
+
+def test_write_landing_mid_load_is_not_lost(store):
+    store.save('u1', {'email': 'a@b'})
+    admin_db.record_feedback('u1', 5, LIKE)
+
+    # The load reads the store before the like is written, the like lands before the pending check
+    store.race = True
+    assert admin_db.get_cached_user_data('u1')['liked_ids'] == [5]
+    assert admin_db._user_cache.get('u1')['liked_ids'] == [5]
+
+
+def test_queued_writes_overlay_the_stored_document(store):
+    store.save('u1', {'email': 'a@b'})
+    admin_db.record_feedback('u1', 7, LIKE)
+    assert admin_db.get_cached_user_data('u1')['liked_ids'] == [7]
+    admin_db._user_writes.drain()
+    admin_db.clear_user_cache('u1')
+    assert admin_db.get_cached_user_data('u1') == {'email': 'a@b', 'liked_ids': [7], 'disliked_ids': [],
+                                                   'preferences_set': True}
+
+
+def reload(user_id):
+    admin_db.clear_user_cache(user_id)
+    return admin_db.get_cached_user_data(user_id)
+
+
+def test_saved_likes_replace_earlier_events(store):
+    for movie_id in (10, 11):
+        admin_db.record_feedback('u1', movie_id, LIKE)
+    admin_db.record_feedback('u1', 12, DISLIKE)
+    admin_db._user_writes.drain()
+
+    assert admin_db.save_likes_to_db('u1', [], email='a@b') == {"status": "success"}
+    assert admin_db.get_likes_from_db('u1') == []
+    doc = reload('u1')
+    assert (doc['liked_ids'], doc['disliked_ids'], doc['email']) == ([], [12], 'a@b')
+    assert admin_db.get_likes_from_db('u1') == []
+
+    assert admin_db.save_likes_to_db('u1', [3, 12, 4])['status'] == "success"
+    doc = reload('u1')
+    assert (doc['liked_ids'], doc['disliked_ids']) == ([3, 12, 4], [])
+
+
+def test_snapshot_lands_after_queued_events(store):
+    admin_db.record_feedback('u1', 10, LIKE)
+    admin_db.record_feedback('u1', 11, LIKE)
+    # Still queued when the snapshot is written; it must not be replayed over it
+    admin_db.update_user_data('u1', {'liked_ids': [7], 'disliked_ids': [8]})
+    admin_db.record_feedback('u1', 7, UNLIKE)
+    admin_db._user_writes.drain()
+
+    doc = reload('u1')
+    assert (doc['liked_ids'], doc['disliked_ids'], doc['preferences_set']) == ([], [8], True)
+    assert store.compact('u1') > 0
+    assert reload('u1') == doc
+
+
+def test_failed_snapshot_write_raises_and_stays_queued(store):
+    store.unavailable = True
+    with pytest.raises(RuntimeError):
+        admin_db.update_user_data('u1', {'liked_ids': [1]})
+    assert admin_db.save_likes_to_db('u1', [2])['status'] == "error"
+
+    store.unavailable = False
+    admin_db._user_writes.drain()
+    assert reload('u1')['liked_ids'] == [2]
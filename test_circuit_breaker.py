@@ -0,0 +1,100 @@
+import pytest
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("tmdb", failure_threshold=3, reset_timeout=30, clock=clock)
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+
+def test_opens_at_the_failure_threshold(breaker):
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.snapshot()['rejected'] == 1 and breaker.trips == 1
+
+
+def test_success_resets_the_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_after_cooldown_lets_one_probe_through(breaker, clock):
+    trip(breaker)
+    clock.now += 29.9
+    assert not breaker.allow_request()
+    assert breaker.snapshot()['retry_in_seconds'] == 0.1
+
+    clock.now += 0.1
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    # Everyone else keeps getting the fallback while the probe runs
+    assert not breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_probe_success_closes(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_probe_failure_reopens_for_a_full_cooldown(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.trips == 2
+
+    clock.now += 29
+    assert not breaker.allow_request()
+    clock.now += 1
+    assert breaker.allow_request()
+
+
+def test_late_results_while_open_are_ignored(breaker, clock):
+    trip(breaker)
+    opened_at = clock.now
+
+    # Requests that started before the trip finish during the cooldown
+    clock.now += 20
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.trips == 1
+
+    # The cooldown still ends 30s after the trip, not after the late failures
+    clock.now = opened_at + 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
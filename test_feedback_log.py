@@ -0,0 +1,61 @@
+import copy
+from feedback_log import CLEAR, DISLIKE, LIKE, UNLIKE, coalesce_events, feedback_event, replay
+
+
+def event(movie_id, kind, ts=1.0):
+    return feedback_event(movie_id, kind, ts=ts)
+
+
+def test_replay_like_dislike_unlike():
+    doc = replay({}, [event(1, LIKE), event(2, LIKE), event(3, DISLIKE),
+                      event(1, DISLIKE), event(2, UNLIKE), event(3, LIKE), event(3, LIKE)])
+    assert doc['liked_ids'] == [3]
+    assert doc['disliked_ids'] == [1]
+    assert doc['preferences_set'] is True
+
+
+def test_unlike_leaves_dislikes_alone():
+    doc = replay({}, [event(1, DISLIKE), event(1, UNLIKE), event(2, UNLIKE)])
+    assert doc['liked_ids'] == [] and doc['disliked_ids'] == [1]
+
+
+def test_clear_drops_ids_and_title_lists():
+    doc = {'liked_ids': [1], 'disliked_ids': [2], 'liked_movies': ['Alien'], 'preferences_set': True}
+    replay(doc, [event(None, CLEAR)])
+    assert doc['liked_ids'] == [] and doc['disliked_ids'] == []
+    assert doc['liked_movies'] is None and doc['movie_feedback'] is None
+    assert doc['preferences_set'] is False
+
+    replay(doc, [event(4, LIKE)])
+    assert doc['liked_ids'] == [4] and doc['preferences_set'] is True
+
+
+def test_coalesce_keeps_the_last_event_per_movie_in_order():
+    pending = coalesce_events({}, [event(1, LIKE, 1), event(2, LIKE, 2), event(1, DISLIKE, 3)])
+    assert [(e['movie_id'], e['type']) for e in pending.values()] == [(2, LIKE), (1, DISLIKE)]
+
+    coalesce_events(pending, [event(3, LIKE, 4), event(2, UNLIKE, 5)])
+    assert [e['movie_id'] for e in pending.values()] == [1, 3, 2]
+
+
+def test_coalesce_clear_supersedes_earlier_events():
+    pending = coalesce_events({}, [event(1, LIKE), event(2, DISLIKE), event(None, CLEAR), event(3, LIKE)])
+    assert [(e['movie_id'], e['type']) for e in pending.values()] == [(None, CLEAR), (3, LIKE)]
+
+
+def test_coalesced_events_replay_to_the_same_document():
+    events = [event(1, LIKE, 1), event(2, DISLIKE, 2), event(1, UNLIKE, 3), event(3, LIKE, 4),
+              event(2, LIKE, 5), event(None, CLEAR, 6), event(4, DISLIKE, 7), event(3, LIKE, 8),
+              event(4, LIKE, 9)]
+    base = {'liked_ids': [7], 'disliked_ids': [8]}
+    for split in range(len(events) + 1):
+        pending = coalesce_events({}, events[:split])
+        coalesce_events(pending, events[split:])
+        assert replay(copy.deepcopy(base), pending.values()) == replay(copy.deepcopy(base), events)
+
+
+def test_coalesce_copies_events():
+    original = event(1, LIKE)
+    pending = coalesce_events({}, [original])
+    pending[1]['type'] = DISLIKE
+    assert original['type'] == LIKE
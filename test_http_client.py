@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+import pytest
+import requests
+from http_client import HostBusyError, HttpClient
+from test_prefetch_posters import tmdb  # noqa: F401  (stub server fixture)
+
+
+def test_requests_per_host_are_capped(tmdb):
+    tmdb.delay = 0.05
+    client = HttpClient(max_per_host=3)
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        statuses = list(pool.map(lambda i: client.get(f"{tmdb.base}/movie/{i}").status_code, range(24)))
+
+    assert statuses == [200] * 24
+    assert tmdb.max_active == 3
+
+
+def test_waiting_for_a_slot_times_out(tmdb):
+    tmdb.delay = 0.5
+    client = HttpClient(max_per_host=1, slot_timeout=0.1)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(client.get, f"{tmdb.base}/movie/1")
+        while not tmdb.active:
+            time.sleep(0.01)
+        with pytest.raises(HostBusyError):
+            client.get(f"{tmdb.base}/movie/2")
+        assert first.result().status_code == 200
+
+    # The slot is free again once the first call returned
+    assert client.get(f"{tmdb.base}/movie/3").status_code == 200
+
+
+def test_slot_is_released_when_the_request_fails(tmdb):
+    tmdb.delay = 0.3
+    client = HttpClient(max_per_host=1, retries=0, slot_timeout=0.1)
+    with pytest.raises(requests.exceptions.RequestException):
+        client.get(f"{tmdb.base}/movie/1", timeout=0.05)
+    tmdb.delay = 0
+    assert client.get(f"{tmdb.base}/movie/2").status_code == 200
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from catalog import MovieCatalog
+from movie_search import MovieSearch, TypeAhead, normalize_query
+from test_search_index import synthetic_titles
+
+
+def make_catalog(titles):
+    movies = pd.DataFrame({'movie_id': np.arange(100, 100 + len(titles)), 'title': titles})
+    return MovieCatalog(movies, genre_vocab=[], genre_matrix=np.zeros((len(titles), 0), dtype=np.uint8))
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    titles = synthetic_titles(2000)
+    # Duplicate and differently cased titles, as in the TMDB data
+    return make_catalog(titles + titles[:20] + [t.upper() for t in titles[20:40]])
+
+
+def keystrokes(text):
+    return [text[:i] for i in range(1, len(text) + 1)]
+
+
+@pytest.mark.parametrize("typed", [
+    keystrokes("star king"),
+    keystrokes("dark n") + ["dark", "dar"] + keystrokes("dark road")[3:],
+    keystrokes("ing") + ["ghost"] + keystrokes("ghost ri"),
+    ["re", "ret", "retu", "zz", "zzz", "r", "ri", "riv", "river"],
+])
+def test_typeahead_matches_fresh_lookups(catalog, typed):
+    narrowed = MovieSearch(catalog)
+    typeahead = TypeAhead(narrowed)
+    for query in typed:
+        # A new MovieSearch per query, so nothing comes from the query cache
+        fresh = MovieSearch(catalog)
+        assert narrowed.search(query, typeahead=typeahead) == fresh.search(query), query
+        assert narrowed.suggest(query, typeahead=typeahead) == fresh.suggest(query), query
+    assert typeahead.refined > 0
+
+
+def test_search_orders_exact_then_prefix_then_contains(catalog):
+    search = MovieSearch(catalog)
+    title = catalog.title(0)
+    rows = search.search(title.lower())
+    assert catalog.title(rows[0]).lower() == title.lower()
+    assert len({catalog.title(row) for row in rows}) == len(rows)
+
+
+def test_normalize_query():
+    assert normalize_query("  Star   KING ") == "star king"
+    assert normalize_query(None) == ""
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from neighbors import (BLOCK_BYTES_PER_CELL, SparseCosineRows, block_rows, build_neighbor_index,
+                       ranking_agreement, top_k_rows)
+
+
+def masked_top_k(block, k, row_offset=0):
+    """Reference: mask each movie's self-similarity, then sort every row in full"""
+    block = np.array(block, dtype=np.float64)
+    for r in range(len(block)):
+        if r + row_offset < block.shape[1]:
+            block[r, r + row_offset] = -np.inf
+    order = np.argsort(-block, axis=1, kind='stable')[:, :k]
+    return order, np.take_along_axis(block, order, axis=1)
+
+
+@pytest.fixture(scope="module")
+def similarity():
+    rng = np.random.default_rng(11)
+    counts = rng.poisson(0.4, size=(120, 30))
+    return SparseCosineRows(sparse.csr_matrix(counts))
+
+
+def test_top_k_rows_matches_full_sort():
+    rng = np.random.default_rng(5)
+    # Distinct scores, so the top K is unambiguous
+    block = rng.permutation(40 * 25).reshape(25, 40).astype(np.float32) / 1000
+    for offset in (0, 10, 30):
+        indices, scores = top_k_rows(block, 7, row_offset=offset)
+        expected_indices, expected_scores = masked_top_k(block, 7, row_offset=offset)
+        assert indices.tolist() == expected_indices.tolist()
+        np.testing.assert_array_equal(scores, expected_scores.astype(np.float32))
+        assert not (indices == (np.arange(25) + offset)[:, None]).any()
+
+
+def test_top_k_rows_leaves_the_block_untouched():
+    block = np.random.default_rng(2).random((6, 10), dtype=np.float32)
+    original = block.copy()
+    top_k_rows(block, 3)
+    np.testing.assert_array_equal(block, original)
+
+
+def test_top_k_rows_caps_k_at_the_other_movies():
+    indices, scores = top_k_rows(np.eye(4, dtype=np.float32) + 0.5, 10)
+    assert indices.shape == (4, 3)
+    assert not (indices == np.arange(4)[:, None]).any()
+
+
+def test_index_does_not_depend_on_block_size(similarity):
+    reference = build_neighbor_index(similarity, k=15, block_size=similarity.shape[0])
+    for block_size in (1, 7, 64):
+        index = build_neighbor_index(similarity, k=15, block_size=block_size)
+        np.testing.assert_array_equal(index.indptr, reference.indptr)
+        np.testing.assert_array_equal(index.scores, reference.scores)
+
+
+def test_block_rows_follow_the_memory_budget():
+    assert block_rows(1000, memory=BLOCK_BYTES_PER_CELL * 1000 * 50) == 50
+    # A million movies still fits a small budget, one row at a time at worst
+    assert block_rows(1_000_000, memory=256 * 2**20) == 13
+    assert block_rows(1_000_000, memory=1) == 1
+
+
+def test_full_index_reproduces_dense_rankings(similarity):
+    n = similarity.shape[0]
+    index = build_neighbor_index(similarity, k=n, block_memory=BLOCK_BYTES_PER_CELL * n * 10)
+    assert ranking_agreement(similarity, index) == 1.0
@@ -0,0 +1,230 @@
+import copy
+import threading
+import pytest
+from feedback_log import CLEAR, DISLIKE, LIKE, UNLIKE, feedback_event
+from preference_store import (FirestorePreferenceStore, PreferenceStore, SQLitePreferenceStore,
+                              create_preference_store, merge_fields)
+
+
+class FakeFirestore:
+    """In-memory stand-in for the parts of the Firestore client the store uses.
+
+    Like Firestore, a collection only lists documents that were written
+    themselves; a document with a subcollection but no fields of its own
+    does not exist.
+    """
+
+    def __init__(self):
+        self.docs = {}  # path tuple -> fields
+
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def batch(self):
+        return FakeBatch()
+
+    def transaction(self):
+        return FakeBatch()
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference, self.id = reference, reference.path[-1]
+        self.exists = data is not None
+        self._data = copy.deepcopy(data)
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def get(self, transaction=None):
+        return FakeSnapshot(self, self.db.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        if merge:
+            merge_fields(self.db.docs.setdefault(self.path, {}), data)
+        else:
+            self.db.docs[self.path] = copy.deepcopy(data)
+
+    def delete(self):
+        self.db.docs.pop(self.path, None)
+
+    def collection(self, name):
+        return FakeCollection(self.db, self.path + (name,))
+
+
+class FakeCollection:
+    def __init__(self, db, path, order=None, limit=None):
+        self.db, self.path, self._order, self._limit = db, path, order, limit
+
+    def document(self, doc_id):
+        return FakeDocument(self.db, self.path + (doc_id,))
+
+    def order_by(self, field):
+        return FakeCollection(self.db, self.path, field, self._limit)
+
+    def limit(self, count):
+        return FakeCollection(self.db, self.path, self._order, count)
+
+    def stream(self, transaction=None):
+        depth = len(self.path) + 1
+        paths = [p for p in self.db.docs if len(p) == depth and p[:-1] == self.path]
+        if self._order == '__name__':
+            paths.sort(key=lambda p: p[-1])
+        elif self._order:
+            paths.sort(key=lambda p: self.db.docs[p][self._order])
+        return [FakeSnapshot(FakeDocument(self.db, p), self.db.docs[p]) for p in paths[:self._limit]]
+
+
+class FakeBatch:
+    """Batched writes (and transactions) applied together on commit"""
+
+    def __init__(self):
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append(lambda: ref.set(data, merge=merge))
+
+    def delete(self, ref):
+        self.ops.append(ref.delete)
+
+    def commit(self):
+        assert len(self.ops) <= 500
+        for op in self.ops:
+            op()
+
+
+def fake_transactional(fn):
+    def run(transaction):
+        result = fn(transaction)
+        transaction.commit()
+        return result
+    return run
+
+
+@pytest.fixture(params=["sqlite", "firestore"])
+def store(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        return SQLitePreferenceStore(str(tmp_path / "prefs" / "preferences.db"))
+    from firebase_admin import firestore
+    monkeypatch.setattr(firestore, 'transactional', fake_transactional)
+    return FirestorePreferenceStore(client=FakeFirestore())
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    return SQLitePreferenceStore(str(tmp_path / "prefs" / "preferences.db"))
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        PreferenceStore()
+
+    class Partial(PreferenceStore):
+        def load(self, user_id):
+            return None, 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_load_missing_user(store):
+    assert store.load('nobody') == (None, 0)
+    assert store.get('nobody') is None
+
+
+def test_save_merges_fields(store):
+    store.save('u1', {'email': 'a@b', 'settings': {'theme': 'dark', 'grid': 5}})
+    store.save('u1', {'settings': {'grid': 3}, 'liked_ids': [1, 2]})
+    assert store.get('u1') == {'email': 'a@b', 'settings': {'theme': 'dark', 'grid': 3},
+                               'liked_ids': [1, 2]}
+
+
+def test_append_feedback_is_replayed_on_load(store):
+    store.save('u1', {'liked_ids': [1], 'disliked_ids': []})
+    store.append_feedback('u1', [feedback_event(2, LIKE), feedback_event(1, DISLIKE)],
+                          fields={'email': 'a@b'})
+    store.append_feedback('u1', [feedback_event(2, UNLIKE)])
+
+    data, replayed = store.load('u1')
+    assert replayed == 3
+    assert data['liked_ids'] == [] and data['disliked_ids'] == [1]
+    assert data['email'] == 'a@b'
+
+
+def test_events_without_a_document(store):
+    store.append_feedback('u2', [feedback_event(5, LIKE)])
+    assert store.load('u2') == ({'liked_ids': [5], 'disliked_ids': [], 'preferences_set': True}, 1)
+
+
+def test_events_written_together_replay_in_order(store):
+    # A clear and the likes that follow it are often stamped with the same time
+    events = [feedback_event(1, LIKE), feedback_event(None, CLEAR)] + [feedback_event(i, LIKE) for i in range(2, 12)]
+    for event in events:
+        event['ts'] = 1.0
+    store.append_feedback('u1', events)
+    assert store.get('u1')['liked_ids'] == list(range(2, 12))
+
+
+def test_compact_folds_and_deletes_events(store):
+    store.save('u1', {'email': 'a@b'})
+    store.append_feedback('u1', [feedback_event(i, LIKE) for i in range(5)])
+    store.append_feedback('u1', [feedback_event(None, CLEAR), feedback_event(9, DISLIKE)])
+    before = store.get('u1')
+
+    assert store.compact('u1') == 7
+    assert store.load('u1') == (before, 0)
+    assert before['liked_ids'] == [] and before['disliked_ids'] == [9]
+    assert store.compact('u1') == 0
+
+    # Events after a compaction replay over the new snapshot
+    store.append_feedback('u1', [feedback_event(3, LIKE)])
+    data, replayed = store.load('u1')
+    assert replayed == 1 and data['liked_ids'] == [3] and data['disliked_ids'] == [9]
+
+
+def test_data_survives_reopening(sqlite_store):
+    sqlite_store.append_feedback('u1', [feedback_event(1, LIKE)])
+    reopened = SQLitePreferenceStore(sqlite_store.path)
+    assert reopened.get('u1')['liked_ids'] == [1]
+
+
+def test_export_covers_documents_and_event_only_users(store):
+    store.save('u1', {'email': 'a@b'})
+    store.append_feedback('u2', [feedback_event(4, LIKE)])
+    exported = dict(store.export())
+    assert exported == {'u1': {'email': 'a@b'},
+                        'u2': {'liked_ids': [4], 'disliked_ids': [], 'preferences_set': True}}
+
+
+def test_failed_transaction_rolls_back(sqlite_store):
+    sqlite_store.save('u1', {'email': 'a@b'})
+    with pytest.raises(TypeError):
+        # Not JSON serializable: nothing from this call may be written
+        sqlite_store.append_feedback('u1', [feedback_event(1, LIKE), {'movie_id': 2, 'type': LIKE, 'ts': object()}],
+                                     fields={'email': 'changed'})
+    assert sqlite_store.load('u1') == ({'email': 'a@b'}, 0)
+
+
+def test_concurrent_appends_are_all_kept(sqlite_store):
+    def like(start):
+        for movie_id in range(start, start + 50):
+            sqlite_store.append_feedback('u1', [feedback_event(movie_id, LIKE)])
+
+    threads = [threading.Thread(target=like, args=(i * 50,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    data, replayed = sqlite_store.load('u1')
+    assert replayed == 200 and sorted(data['liked_ids']) == list(range(200))
+
+
+def test_create_preference_store_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        create_preference_store("redis")
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import pytest
+from artifacts import read_manifest, read_strings, write_artifacts
+from neighbors import NeighborIndex
+from prefetch_posters import CHECKPOINT_FILE, RateLimiter, prefetch_poster_paths
+
+
+class StubTMDB:
+    """Local stand-in for TMDB's /movie/{id} endpoint.
+
+    Ids in ``missing`` answer 404 (no poster), ids in ``failing`` answer 403
+    (not retried by the client), everything else returns a poster path after
+    ``delay`` seconds. ``max_active`` is the most requests seen in flight at once.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.failing = set()
+        self.missing = set()
+        self.delay = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                movie_id = int(self.path.split('?')[0].rsplit('/', 1)[-1])
+                with stub._lock:
+                    stub.requests.append((movie_id, time.monotonic()))
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                time.sleep(stub.delay)
+                # Leave the count before answering, so the client can't start its next call first
+                with stub._lock:
+                    stub.active -= 1
+                if movie_id in stub.failing:
+                    self.send_response(403)
+                    self.end_headers()
+                    return
+                if movie_id in stub.missing:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = json.dumps({"poster_path": f"/p{movie_id}.jpg"}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def requested_ids(self):
+        return sorted(movie_id for movie_id, _ in self.requests)
+
+
+@pytest.fixture
+def tmdb():
+    stub = StubTMDB()
+    stub.thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def make_model(model_dir, movie_ids):
+    n = len(movie_ids)
+    movies = pd.DataFrame({'movie_id': movie_ids, 'title': [f"Movie {i}" for i in range(n)]})
+    neighbors = NeighborIndex(np.zeros(n + 1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                              np.empty(0, dtype=np.float32))
+    write_artifacts(str(model_dir), movies, neighbors, [], np.zeros((n, 0), dtype=np.uint8))
+
+
+def poster_paths(model_dir):
+    manifest = read_manifest(str(model_dir))
+    return dict(zip(np.load(os.path.join(str(model_dir), manifest["arrays"]["movie_ids"]["file"])).tolist(),
+                    read_strings(str(model_dir), manifest)['poster_path']))
+
+
+def test_rate_limiter_paces_after_burst():
+    limiter = RateLimiter(rate=50, burst=5)
+    start = time.monotonic()
+    for _ in range(30):
+        limiter.acquire()
+    # 5 tokens up front, the other 25 at 50 per second
+    assert time.monotonic() - start >= 25 / 50 * 0.9
+
+
+def test_prefetch_against_stub_is_rate_limited(tmp_path, tmdb):
+    movie_ids = list(range(1, 16))
+    make_model(tmp_path, movie_ids)
+    tmdb.missing = {3}
+
+    resolved, failed = prefetch_poster_paths(str(tmp_path), api_key="k", api_base=tmdb.base,
+                                             workers=4, rate=5)
+
+    assert (resolved, failed) == (15, 0)
+    assert tmdb.requested_ids() == movie_ids
+    times = sorted(t for _, t in tmdb.requests)
+    # Bucket of 5 tokens, then 5 per second for the remaining 10 requests
+    assert times[-1] - times[0] >= 10 / 5 * 0.9
+    paths = poster_paths(tmp_path)
+    assert paths[1] == "/p1.jpg" and paths[3] == ""
+    assert not os.path.exists(tmp_path / CHECKPOINT_FILE)
+
+
+def test_failed_ids_are_checkpointed_and_retried(tmp_path, tmdb):
+    movie_ids = list(range(1, 11))
+    make_model(tmp_path, movie_ids)
+    tmdb.failing = {4, 7}
+
+    resolved, failed = prefetch_poster_paths(str(tmp_path), api_key="k", api_base=tmdb.base,
+                                             workers=4, rate=1000)
+
+    assert (resolved, failed) == (8, 2)
+    # Failed lookups store no path and keep the checkpoint for the next run
+    paths = poster_paths(tmp_path)
+    assert paths[4] is None and paths[7] is None and paths[5] == "/p5.jpg"
+    with open(tmp_path / CHECKPOINT_FILE, encoding='utf-8') as f:
+        assert sorted(json.loads(line)['movie_id'] for line in f) == [1, 2, 3, 5, 6, 8, 9, 10]
+
+    # The rerun only asks for the ids that failed
+    tmdb.failing = set()
+    tmdb.requests.clear()
+    resolved, failed = prefetch_poster_paths(str(tmp_path), api_key="k", api_base=tmdb.base,
+                                             workers=4, rate=1000)
+
+    assert (resolved, failed) == (2, 0)
+    assert tmdb.requested_ids() == [4, 7]
+    assert all(path == f"/p{mid}.jpg" for mid, path in poster_paths(tmp_path).items())
+    assert not os.path.exists(tmp_path / CHECKPOINT_FILE)
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path, tmdb):
+    movie_ids = list(range(1, 7))
+    make_model(tmp_path, movie_ids)
+    # A run that stopped after two lookups, with a torn last line
+    with open(tmp_path / CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
+        f.write('{"movie_id": 1, "poster_path": "/old1.jpg"}\n{"movie_id": 2, "poster_path": ""}\n{"movie_')
+
+    resolved, failed = prefetch_poster_paths(str(tmp_path), api_key="k", api_base=tmdb.base,
+                                             workers=2, rate=1000)
+
+    assert (resolved, failed) == (4, 0)
+    assert tmdb.requested_ids() == [3, 4, 5, 6]
+    paths = poster_paths(tmp_path)
+    assert paths[1] == "/old1.jpg" and paths[2] == "" and paths[6] == "/p6.jpg"
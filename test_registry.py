@@ -0,0 +1,83 @@
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from artifacts import write_artifacts
+from genres import build_genre_matrix
+from neighbors import build_neighbor_index
+from registry import MOVIE_PKL, SIMILARITY_PKL, ModelRegistry, model_available
+
+GENRES = ['Action', 'Comedy', 'Drama']
+
+
+def movies_frame(n=30):
+    return pd.DataFrame({
+        'movie_id': np.arange(100, 100 + n),
+        'title': [f"Movie {i}" for i in range(n)],
+        'genres': [[GENRES[i % 3], GENRES[(i + 1) % 3]] for i in range(n)],
+        'tags': [f"tag{i % 5} word{i % 7}" for i in range(n)],
+    })
+
+
+def similarity_matrix(n=30, seed=4):
+    sim = np.random.default_rng(seed).random((n, n))
+    return (sim + sim.T) / 2
+
+
+def test_pickle_model_is_reduced_to_a_neighbor_index(tmp_path):
+    movies, similarity = movies_frame(), similarity_matrix()
+    assert not model_available(str(tmp_path))
+    with open(tmp_path / MOVIE_PKL, 'wb') as f:
+        pickle.dump(movies, f)
+    assert not model_available(str(tmp_path))
+    with open(tmp_path / SIMILARITY_PKL, 'wb') as f:
+        pickle.dump(similarity, f)
+    assert model_available(str(tmp_path))
+
+    registry = ModelRegistry.load(str(tmp_path))
+    assert registry.source == "pickle"
+    assert len(registry.catalog) == 30
+    assert registry.catalog.genre_matrix.sum() == 60
+    np.testing.assert_array_equal(registry.neighbors.indptr, build_neighbor_index(similarity).indptr)
+    assert registry.catalog.text_index is not None
+
+
+def test_manifest_model_is_preferred(tmp_path):
+    movies, similarity = movies_frame(), similarity_matrix()
+    vocab, matrix = build_genre_matrix(movies['genres'])
+    write_artifacts(str(tmp_path), movies[['movie_id', 'title']], build_neighbor_index(similarity),
+                    vocab, matrix)
+    with open(tmp_path / MOVIE_PKL, 'wb') as f:
+        pickle.dump(movies, f)
+    with open(tmp_path / SIMILARITY_PKL, 'wb') as f:
+        pickle.dump(similarity, f)
+    assert model_available(str(tmp_path))
+    assert ModelRegistry.load(str(tmp_path)).source == "manifest"
+
+
+def test_memory_usage_counts_arrays_and_table_contents(tmp_path):
+    with open(tmp_path / MOVIE_PKL, 'wb') as f:
+        pickle.dump(movies_frame(), f)
+    with open(tmp_path / SIMILARITY_PKL, 'wb') as f:
+        pickle.dump(similarity_matrix(), f)
+    registry = ModelRegistry.load(str(tmp_path))
+    catalog = registry.catalog
+
+    usage = registry.memory_usage()
+    assert usage['neighbor_index'] == registry.neighbors.nbytes
+    assert usage['genre_matrix'] == catalog.genre_matrix.nbytes
+    # More than the shallow size of the hash tables: keys and row lists are included
+    shallow = sum(sys.getsizeof(t) for t in (catalog.title_to_row, catalog.lower_to_rows, catalog.id_to_row))
+    assert usage['lookup_tables'] > shallow
+    assert usage['total'] == sum(v for k, v in usage.items() if k != 'total')
+
+
+def test_arrays_are_read_only(tmp_path):
+    with open(tmp_path / MOVIE_PKL, 'wb') as f:
+        pickle.dump(movies_frame(), f)
+    with open(tmp_path / SIMILARITY_PKL, 'wb') as f:
+        pickle.dump(similarity_matrix(), f)
+    registry = ModelRegistry.load(str(tmp_path))
+    with pytest.raises(ValueError):
+        registry.neighbors.scores[0] = 1.0
@@ -0,0 +1,87 @@
+from collections import Counter
+import numpy as np
+import pytest
+from scipy import sparse
+from genres import build_genre_matrix
+from neighbors import SparseCosineRows, build_neighbor_index
+from scoring import genre_masks, score_candidates, top_n_rows
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Romance', 'Sci-Fi', 'Thriller']
+
+
+def synthetic_catalog(n=60, n_terms=25, seed=3):
+    """(dense similarity, genre lists) for ``n`` movies; a few have no terms, so many scores tie at zero"""
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(0.3, size=(n, n_terms))
+    counts[rng.choice(n, size=n // 6, replace=False)] = 0
+    similarity = SparseCosineRows(sparse.csr_matrix(counts))[0:n]
+    genre_lists = [list(rng.choice(GENRES, size=rng.integers(0, 3), replace=False)) for _ in range(n)]
+    return similarity, genre_lists
+
+
+def dense_recommendations(similarity, genre_lists, liked, disliked, top_n=10, genre_boost=0.25):
+    """The original dict-and-loop ranking over the dense similarity matrix"""
+    content = {}
+    for i, idx in enumerate(liked):
+        weight = (len(liked) - i) / len(liked)
+        for j, score in enumerate(similarity[idx]):
+            if j in liked or j in disliked:
+                continue
+            content[j] = content.get(j, 0) + score * weight
+
+    liked_genres = [g for idx in liked for g in genre_lists[idx]]
+    disliked_genres = {g for idx in disliked for g in genre_lists[idx]}
+    # Counter.most_common breaks count ties by first appearance; genre_masks breaks them by name
+    top_genres = {g for g, _ in sorted(Counter(liked_genres).items(), key=lambda gc: (-gc[1], gc[0]))[:3]}
+
+    final = {}
+    for idx, score in content.items():
+        if any(g in disliked_genres for g in genre_lists[idx]):
+            continue
+        if any(g in top_genres for g in genre_lists[idx]):
+            score *= (1 + genre_boost)
+        final[idx] = score
+    return sorted(final.items(), key=lambda x: x[1], reverse=True)[:top_n]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    similarity, genre_lists = synthetic_catalog()
+    # K >= N keeps every neighbour, so sparse scoring must reproduce the dense loop exactly
+    index = build_neighbor_index(similarity, k=len(similarity), block_size=16)
+    _, genre_matrix = build_genre_matrix(genre_lists)
+    return similarity, genre_lists, index, genre_matrix
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_matches_dense_loop(catalog, seed):
+    similarity, genre_lists, index, genre_matrix = catalog
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(similarity), size=rng.integers(2, 7), replace=False).tolist()
+    n_disliked = int(rng.integers(0, 3))
+    liked, disliked = picked[n_disliked:], picked[:n_disliked]
+    top_n = int(rng.choice([5, 10, 40]))
+
+    boost_mask, exclude_mask = genre_masks(genre_matrix, liked, disliked)
+    rows, scores = score_candidates(index, liked, disliked, boost_mask=boost_mask,
+                                    exclude_mask=exclude_mask, top_n=top_n)
+
+    expected = dense_recommendations(similarity, genre_lists, liked, disliked, top_n=top_n)
+    assert rows.tolist() == [row for row, _ in expected]
+    np.testing.assert_allclose(scores, [score for _, score in expected], rtol=1e-6)
+
+
+def test_top_n_rows_breaks_ties_by_row():
+    scores = np.array([0.0, 0.5, 0.0, 0.0, 0.5, 0.0, 0.9, 0.0])
+    valid = np.ones(len(scores), dtype=bool)
+    valid[3] = False
+    rows, top = top_n_rows(scores, valid, 5)
+    assert rows.tolist() == [6, 1, 4, 0, 2]
+    assert top.tolist() == [0.9, 0.5, 0.5, 0.0, 0.0]
+
+
+def test_top_n_rows_edge_cases():
+    scores = np.array([0.2, 0.1])
+    assert top_n_rows(scores, np.zeros(2, dtype=bool), 3)[0].tolist() == []
+    assert top_n_rows(scores, np.ones(2, dtype=bool), 0)[0].tolist() == []
+    assert top_n_rows(scores, np.ones(2, dtype=bool), 5)[0].tolist() == [0, 1]
@@ -0,0 +1,64 @@
+import difflib
+import random
+import pytest
+from search_index import PrefixIndex, TrigramIndex
+
+WORDS = ("star dark night return king lost city man woman love war dead blue red last first "
+         "house river shadow iron ghost dream empire storm secret wild heart fire ice golden "
+         "road moon sun island game hunter legend kingdom").split()
+
+
+def synthetic_titles(n=3000, seed=7):
+    rng = random.Random(seed)
+    titles = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))) for _ in range(n)]
+    return list(dict.fromkeys(t.title() for t in titles))
+
+
+def typo(text, rng):
+    i = rng.randrange(len(text))
+    op = rng.choice("dis")
+    if op == "d":
+        return text[:i] + text[i + 1:]
+    if op == "i":
+        return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i:]
+    return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i + 1:]
+
+
+@pytest.fixture(scope="module")
+def lower_titles():
+    return [t.lower() for t in synthetic_titles()]
+
+
+@pytest.fixture(scope="module")
+def trigram_index(lower_titles):
+    return TrigramIndex(lower_titles)
+
+
+def test_prefix_index_matches_startswith():
+    titles = synthetic_titles(500)
+    index = PrefixIndex(titles)
+    for prefix in ("s", "star", "dark n", "zz", ""):
+        expected = sorted((t.lower(), row) for row, t in enumerate(titles) if t.lower().startswith(prefix))
+        assert index.rows_with_prefix(prefix) == [row for _, row in expected]
+
+
+def test_containing_matches_substring_scan(lower_titles, trigram_index):
+    for query in ("a", "ar", "ng ", "ght re", "night", "old r", "xyz"):
+        expected = [i for i, t in enumerate(lower_titles) if query in t]
+        assert list(trigram_index.containing(query)) == expected
+
+
+def test_close_matches_agree_with_difflib(lower_titles, trigram_index):
+    rng = random.Random(1)
+    queries = [typo(rng.choice(lower_titles), rng) for _ in range(60)]
+    top1 = top5 = 0
+    for query in queries:
+        expected = difflib.get_close_matches(query, lower_titles, n=5, cutoff=0.6)
+        got = trigram_index.close_matches(query, n=5, cutoff=0.6)
+        # Everything returned really passes difflib's cutoff
+        assert all(difflib.SequenceMatcher(None, t, query).ratio() >= 0.6 for t in got)
+        top1 += got[:1] == expected[:1]
+        top5 += len(set(got) & set(expected)) / max(len(expected), 1)
+    # The best match agrees; the rest of the top 5 is an approximation
+    assert top1 == len(queries)
+    assert top5 / len(queries) >= 0.85
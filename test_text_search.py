@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from text_search import BM25Index, decode_varints, encode_varints, tokenize
+
+
+def synthetic_documents(n=3000, vocab=400, seed=3):
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocab)])
+    # Zipf-like term frequencies, so some posting lists span many blocks
+    p = 1.0 / np.arange(1, vocab + 1)
+    lengths = rng.integers(5, 40, size=n)
+    tokens = rng.choice(words, size=int(lengths.sum()), p=p / p.sum())
+    return [" ".join(doc) for doc in np.split(tokens, np.cumsum(lengths)[:-1])], words
+
+
+def exhaustive_search(index, query, k):
+    """Sum every query term's impacts over all its blocks, ties broken by doc id"""
+    scores = np.zeros(index.n_docs, dtype=np.int64)
+    for term in dict.fromkeys(t for t in tokenize(query) if t in index.term_ids):
+        term_id = index.term_ids[term]
+        blocks = np.arange(index.term_blocks[term_id], index.term_blocks[term_id + 1])
+        docs, impacts = index._decode_blocks(blocks)
+        scores[docs] += impacts
+    hits = np.flatnonzero(scores)
+    order = np.lexsort((hits, -scores[hits]))[:k]
+    return hits[order], scores[hits[order]]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    documents, words = synthetic_documents()
+    return BM25Index.build(documents), documents, words
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 2 ** 21, 2 ** 35 + 5], dtype=np.int64)
+    assert decode_varints(encode_varints(values)).tolist() == values.tolist()
+
+
+def test_blocks_decode_to_the_original_postings(corpus):
+    index, documents, _ = corpus
+    term_id = index.term_ids["w0"]
+    docs, _ = index._decode_blocks(np.arange(index.term_blocks[term_id], index.term_blocks[term_id + 1]))
+    assert docs.tolist() == [i for i, doc in enumerate(documents) if "w0" in doc.split()]
+
+
+def test_maxscore_matches_exhaustive_ranking(corpus):
+    index, _, words = corpus
+    rng = np.random.default_rng(11)
+    for _ in range(200):
+        query = " ".join(rng.choice(words[:150], size=rng.integers(1, 5)))
+        k = int(rng.choice([1, 5, 10, 20]))
+        rows, scores = index.search(query, k)
+        expected_rows, expected_scores = exhaustive_search(index, query, k)
+        assert rows.tolist() == expected_rows.tolist(), query
+        assert np.allclose(scores, expected_scores * index.scale)
+
+
+def test_unknown_terms_return_nothing(corpus):
+    index, _, _ = corpus
+    rows, scores = index.search("nothing matches this", 10)
+    assert len(rows) == 0 and len(scores) == 0
@@ -0,0 +1,87 @@
+import types
+import pytest
+import ttl_cache
+from ttl_cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manual clock standing in for time.monotonic inside ttl_cache"""
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=30)
+    cache.set('a', 1)
+
+    clock[0] += 29.9
+    assert cache.get('a') == 1
+    clock[0] += 0.1
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+    assert len(cache) == 0
+    assert cache.stats()['expirations'] == 1
+
+
+def test_per_key_ttl_overrides_default(clock):
+    cache = TTLCache(maxsize=10, ttl=30)
+    cache.set('short', 1, ttl=5)
+    cache.set('long', 2)
+
+    clock[0] += 10
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+
+
+def test_set_refreshes_expiry(clock):
+    cache = TTLCache(maxsize=10, ttl=30)
+    cache.set('a', 1)
+    clock[0] += 20
+    cache.set('a', 2)
+    clock[0] += 20
+    assert cache.get('a') == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=3, ttl=30)
+    for key in 'abc':
+        cache.set(key, key.upper())
+
+    # Reading 'a' makes 'b' the least recently used
+    assert cache.get('a') == 'A'
+    cache.set('d', 'D')
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['A', 'C', 'D']
+
+    # Overwriting counts as a use too
+    cache.set('a', 'A2')
+    cache.set('e', 'E')
+    assert cache.get('c') is None
+    assert cache.get('a') == 'A2'
+    assert len(cache) == 3
+    assert cache.stats()['evictions'] == 2
+
+
+def test_invalidate_clear_and_stats(clock):
+    cache = TTLCache(maxsize=5, ttl=30)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    assert cache.invalidate('a') is True
+    assert cache.invalidate('a') is False
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    cache.clear()
+    assert cache.get('b') is None
+
+    assert cache.stats() == {'size': 0, 'maxsize': 5, 'hits': 1, 'misses': 2,
+                             'evictions': 0, 'expirations': 0}
+
+
+def test_cached_none_is_a_hit(clock):
+    cache = TTLCache(maxsize=5, ttl=30)
+    cache.set('a', None)
+    assert cache.get('a', 'default') is None
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,114 @@
+import types
+import numpy as np
+import pandas as pd
+import pytest
+import admin_db
+import user_feedback
+from catalog import MovieCatalog
+from feedback_log import CLEAR, DISLIKE, LIKE, UNLIKE
+from test_admin_db import reload, store  # noqa: F401 (fixture)
+from user_feedback import UserFeedback, session_feedback
+
+
+@pytest.fixture
+def catalog():
+    # "Heat" twice: titles map to the first movie with that title
+    titles = ["Alien", "Heat", "Up", "Heat", "Jaws"]
+    movies = pd.DataFrame({'movie_id': np.arange(100, 100 + len(titles)), 'title': titles})
+    return MovieCatalog(movies, genre_vocab=[], genre_matrix=np.zeros((len(titles), 0), dtype=np.uint8))
+
+
+@pytest.fixture
+def session(monkeypatch):
+    state = {}
+    monkeypatch.setattr(user_feedback, 'st', types.SimpleNamespace(session_state=state))
+    return state
+
+
+def test_apply_matches_the_event_log():
+    feedback = UserFeedback([1, 2, 1], [3])
+    assert feedback.liked.tolist() == [1, 2] and feedback.liked.dtype == np.int32
+
+    feedback.apply(3, LIKE)
+    feedback.apply(1, DISLIKE)
+    feedback.apply(2, UNLIKE)
+    feedback.apply(2, UNLIKE)
+    assert (feedback.liked.tolist(), feedback.disliked.tolist()) == ([3], [1])
+    assert feedback.is_liked(3) and feedback.is_disliked(1) and not feedback.is_liked(1)
+    assert feedback.to_fields() == {'liked_ids': [3], 'disliked_ids': [1], 'preferences_set': True}
+
+    feedback.apply(None, CLEAR)
+    assert len(feedback) == 0 and feedback.to_fields()['preferences_set'] is False
+
+
+def test_rows_skip_ids_missing_from_the_catalog(catalog):
+    liked, disliked = UserFeedback([104, 999, 100], [102]).rows(catalog)
+    assert liked.tolist() == [4, 0] and disliked.tolist() == [2]
+
+
+def test_from_document_maps_titles_and_keeps_ids(catalog):
+    doc = {'liked_movies': ['Heat', 'Alien'], 'disliked_movies': ['Up'], 'liked_ids': [104, 101]}
+    feedback = UserFeedback.from_document(doc, catalog)
+    assert feedback.liked.tolist() == [101, 100, 104]
+    assert feedback.disliked.tolist() == [102] and feedback.unmatched == {}
+
+
+def test_from_document_reports_unknown_titles(catalog):
+    doc = {'liked_movies': ['Alien', 'Solaris'], 'disliked_movies': ['Zardoz']}
+    feedback = UserFeedback.from_document(doc, catalog)
+    assert feedback.liked.tolist() == [100] and len(feedback.disliked) == 0
+    assert feedback.unmatched == {'liked_movies': ['Solaris'], 'disliked_movies': ['Zardoz']}
+
+
+def test_from_document_ignores_nothing_left_to_migrate(catalog):
+    doc = {'liked_ids': [103], 'liked_movies': None, 'movie_feedback': None}
+    feedback = UserFeedback.from_document(doc, catalog)
+    assert feedback.liked.tolist() == [103] and feedback.unmatched == {}
+    assert len(UserFeedback.from_document(None, catalog)) == 0
+
+
+def test_session_feedback_without_a_user(catalog, session):
+    feedback = session_feedback(catalog)
+    assert len(feedback) == 0 and session['feedback'] is feedback
+    assert session_feedback(catalog) is feedback
+
+
+def test_migration_keeps_unmatched_titles_and_runs_once(catalog, session, store, monkeypatch):
+    store.save('u1', {'email': 'a@b', 'liked_movies': ['Heat', 'Solaris'], 'disliked_movies': ['Up'],
+                      'movie_feedback': {'Heat': {'type': 'like'}}})
+    # Liked by id after the titles were written, before this migration
+    store.append_feedback('u1', [admin_db.feedback_event(104, LIKE)])
+
+    session['uid'] = 'u1'
+    feedback = session_feedback(catalog)
+    assert (feedback.liked.tolist(), feedback.disliked.tolist()) == ([101, 104], [102])
+    admin_db._user_writes.drain()
+
+    doc = reload('u1')
+    assert (doc['liked_ids'], doc['disliked_ids'], doc['email']) == ([101, 104], [102], 'a@b')
+    assert doc['legacy_unmatched'] == {'liked_movies': ['Solaris']}
+    assert all(doc[field] is None for field in ('liked_movies', 'disliked_movies', 'movie_feedback'))
+    assert store.load('u1')[1] == 0  # folded into the document
+
+    # A second session finds nothing to migrate and writes nothing
+    migrations = []
+    monkeypatch.setattr(user_feedback, 'migrate_user_feedback', lambda *args: migrations.append(args))
+    session.clear()
+    session['uid'] = 'u1'
+    assert session_feedback(catalog).liked.tolist() == [101, 104]
+    assert migrations == []
+
+
+def test_migrating_twice_gives_the_same_document(catalog, session, store):
+    store.save('u1', {'liked_movies': ['Alien', 'Solaris']})
+    session['uid'] = 'u1'
+    feedback = UserFeedback.from_document(admin_db.get_cached_user_data('u1'), catalog)
+
+    # Two sessions of one user both migrate the document they loaded
+    for _ in range(2):
+        admin_db.migrate_user_feedback('u1', feedback.to_fields(), feedback.unmatched)
+        admin_db._user_writes.drain()
+    doc = reload('u1')
+    assert (doc['liked_ids'], doc['disliked_ids'], doc['preferences_set']) == ([100], [], True)
+    assert doc['legacy_unmatched'] == {'liked_movies': ['Solaris']} and doc['liked_movies'] is None
+    assert session_feedback(catalog).liked.tolist() == [100]
@@ -0,0 +1,123 @@
+import threading
+import time
+import pytest
+from preference_store import merge_fields
+from write_behind import WriteBehindQueue
+
+
+class Recorder:
+    """Writer that records calls and can be made to fail or block"""
+
+    def __init__(self):
+        self.writes = []
+        self.fail = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, key, fields):
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            self.fail -= 1
+            raise IOError("store unavailable")
+        self.writes.append((key, dict(fields)))
+
+
+@pytest.fixture
+def writer():
+    return Recorder()
+
+
+def test_updates_for_a_key_are_coalesced(writer):
+    # A long interval keeps the background thread from flushing mid-test
+    queue = WriteBehindQueue(writer, interval=60)
+    queue.enqueue('u1', {'a': 1, 'b': 1})
+    queue.enqueue('u1', {'b': 2})
+    queue.enqueue('u2', {'a': 3})
+    queue.enqueue('u1', {'c': 3})
+
+    assert queue.pending('u1') == {'a': 1, 'b': 2, 'c': 3}
+    assert queue.drain() == []
+    assert sorted(writer.writes) == [('u1', {'a': 1, 'b': 2, 'c': 3}), ('u2', {'a': 3})]
+    assert queue.pending('u1') is None
+    stats = queue.stats()
+    assert (stats['enqueued'], stats['coalesced'], stats['written']) == (4, 2, 2)
+
+
+def test_pending_includes_fields_being_written(writer):
+    queue = WriteBehindQueue(writer, interval=60)
+    queue.enqueue('u1', {'a': 1, 'b': 1})
+    writer.release.clear()
+    flusher = threading.Thread(target=queue.drain)
+    flusher.start()
+    assert writer.started.wait(5)
+
+    # The writer holds the batch; reads must still see it, with newer fields on top
+    assert queue.pending('u1') == {'a': 1, 'b': 1}
+    queue.enqueue('u1', {'b': 2})
+    assert queue.pending('u1') == {'a': 1, 'b': 2}
+    assert queue.stats()['in_flight'] == 1
+
+    writer.release.set()
+    flusher.join(5)
+    assert queue.drain() == []
+    assert writer.writes == [('u1', {'a': 1, 'b': 1}), ('u1', {'b': 2})]
+    assert queue.pending('u1') is None
+
+
+def test_failed_write_is_retried_with_backoff(writer):
+    queue = WriteBehindQueue(writer, interval=0.05, max_backoff=0.15)
+    writer.fail = 2
+    queue.enqueue('u1', {'a': 1})
+
+    assert queue.drain() == ['u1']
+    assert queue.stats()['retrying'] == 1
+    # Newer fields are merged over the failed batch, which stays readable
+    queue.enqueue('u1', {'b': 2})
+    assert queue.pending('u1') == {'a': 1, 'b': 2}
+
+    # Not due yet: the retry waits out its backoff
+    queue._write_due()
+    assert writer.writes == [] and writer.fail == 1
+
+    deadline = time.monotonic() + 5
+    while queue.pending('u1') is not None and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    assert writer.writes == [('u1', {'a': 1, 'b': 2})]
+    stats = queue.stats()
+    assert (stats['failures'], stats['retrying'], stats['written']) == (2, 0, 1)
+
+
+def test_flush_skips_the_backoff(writer):
+    queue = WriteBehindQueue(writer, interval=60)
+    writer.fail = 1
+    queue.enqueue('u1', {'a': 1})
+    assert queue.drain() == ['u1']
+    # drain flushes first, so the retry goes out at once
+    assert queue.drain() == []
+    assert writer.writes == [('u1', {'a': 1})]
+
+
+def test_merge_fields_matches_firestore_merge():
+    doc = {'a': {'x': 1, 'y': 2}, 'b': {'x': 1}, 'c': 1}
+    merge_fields(doc, {'a': {'y': 3, 'z': 4}, 'b': {}, 'c': {'x': 1}})
+    # Nested maps merge, an empty map replaces, a map replaces a scalar
+    assert doc == {'a': {'x': 1, 'y': 3, 'z': 4}, 'b': {}, 'c': {'x': 1}}
+
+
+def test_generation_counts_successful_writes(writer):
+    queue = WriteBehindQueue(writer, interval=60)
+    assert queue.generation('u1') == 0
+    queue.enqueue('u1', {'a': 1})
+    assert queue.generation('u1') == 0
+    queue.drain()
+    assert queue.generation('u1') == 1
+
+    writer.fail = 1
+    queue.enqueue('u1', {'a': 2})
+    queue.drain()
+    assert queue.generation('u1') == 1
+    queue.drain()
+    assert queue.generation('u1') == 2 and queue.generation('u2') == 0
@@ -0,0 +1,195 @@
+import re
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer
+
+# Same tokenization at build and query time: lowercase words of 2+ characters, no stop words
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+_TOKEN_RE = re.compile(TOKEN_PATTERN)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Postings per block; blocks are the unit of skipping during top-k search
+BLOCK_SIZE = 128
+
+ARRAY_NAMES = ('term_blocks', 'term_max_impact', 'block_bytes', 'block_postings',
+               'block_first_doc', 'block_last_doc', 'doc_gaps', 'impacts')
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(str(text).lower()) if token not in ENGLISH_STOP_WORDS]
+
+
+def encode_varints(values):
+    """LEB128-encode non-negative integers into one uint8 array"""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35):
+        lengths += values >= (1 << shift)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for j in range(int(lengths.max(initial=1))):
+        has = lengths > j
+        byte = (values[has] >> np.uint64(7 * j)) & np.uint64(0x7F)
+        more = (lengths[has] - 1 > j).astype(np.uint64) << np.uint64(7)
+        out[starts[has] + j] = (byte | more).astype(np.uint8)
+    return out
+
+
+def decode_varints(data):
+    """Inverse of encode_varints"""
+    data = np.asarray(data)
+    if not len(data):
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = 7 * (np.arange(len(data)) - starts[group])
+    return np.add.reduceat((data & 0x7F).astype(np.int64) << shifts, starts)
+
+
+class BM25Index:
+    """BM25 full-text index over one document per catalog row.
+
+    Term scores are precomputed at build time and quantized to uint8
+    "impacts". Each term's postings are split into blocks of BLOCK_SIZE doc
+    ids, stored as varint-encoded gaps, with the doc range of every block
+    kept alongside. ``search`` uses MaxScore-style early termination: terms
+    are visited from highest to lowest upper bound, and once the remaining
+    terms can no longer lift a new document into the top k, only the blocks
+    that overlap current candidates are decoded.
+    """
+
+    def __init__(self, terms, arrays, n_docs, scale):
+        self.terms = list(terms)
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.n_docs = int(n_docs)
+        self.scale = float(scale)
+        for name in ARRAY_NAMES:
+            setattr(self, name, np.asarray(arrays[name]))
+
+    @classmethod
+    def build(cls, documents, k1=BM25_K1, b=BM25_B, block_size=BLOCK_SIZE):
+        """Index an iterable of document strings (row i of the catalog is document i)"""
+        vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, stop_words='english', dtype=np.int32)
+        counts = vectorizer.fit_transform(documents)
+        n_docs = counts.shape[0]
+        doc_len = np.asarray(counts.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if n_docs else 0.0
+
+        # Term-major postings, doc ids ascending within each term
+        postings = counts.tocsc()
+        postings.sort_indices()
+        docs = postings.indices.astype(np.int64)
+        tf = postings.data.astype(np.float64)
+        df = np.diff(postings.indptr)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        term_of = np.repeat(np.arange(len(df)), df)
+        norm = k1 * (1 - b + b * doc_len[docs] / max(avg_len, 1e-9))
+        weights = idf[term_of] * tf * (k1 + 1) / (tf + norm)
+
+        scale = weights.max() / 255 if len(weights) else 1.0
+        impacts = np.clip(np.rint(weights / scale), 1, 255).astype(np.uint8)
+
+        # Split each term's postings into fixed-size blocks
+        term_blocks = np.concatenate(([0], np.cumsum((df + block_size - 1) // block_size)))
+        block_starts = np.concatenate([
+            np.arange(start, stop, block_size)
+            for start, stop in zip(postings.indptr[:-1], postings.indptr[1:])
+        ] or [np.empty(0, dtype=np.int64)]).astype(np.int64)
+        block_ends = np.append(block_starts[1:], len(docs))
+        block_ends = np.minimum(block_ends, np.repeat(postings.indptr[1:], np.diff(term_blocks)))
+
+        # Gaps restart at every block so blocks decode independently
+        gaps = np.diff(docs, prepend=0)
+        gaps[block_starts] = 0
+        block_first_doc = docs[block_starts]
+
+        encoded_lengths = np.ones(len(gaps), dtype=np.int64)
+        for shift in (7, 14, 21, 28, 35):
+            encoded_lengths += gaps >= (1 << shift)
+        byte_offsets = np.concatenate(([0], np.cumsum(encoded_lengths)))
+
+        arrays = {
+            'term_blocks': term_blocks.astype(np.int64),
+            'term_max_impact': np.maximum.reduceat(impacts, postings.indptr[:-1]) if len(impacts)
+            else np.zeros(len(df), dtype=np.uint8),
+            'block_bytes': np.append(byte_offsets[block_starts], byte_offsets[-1]).astype(np.int64),
+            'block_postings': np.append(block_starts, len(docs)).astype(np.int64),
+            'block_first_doc': block_first_doc.astype(np.int32),
+            'block_last_doc': docs[block_ends - 1].astype(np.int32),
+            'doc_gaps': encode_varints(gaps),
+            'impacts': impacts,
+        }
+        return cls(vectorizer.get_feature_names_out(), arrays, n_docs, scale)
+
+    def __len__(self):
+        return self.n_docs
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in ARRAY_NAMES}
+
+    def _decode_blocks(self, blocks):
+        """Doc ids and impacts of the given blocks, concatenated"""
+        if len(blocks) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8)
+        byte_ranges = [self.doc_gaps[self.block_bytes[blk]:self.block_bytes[blk + 1]] for blk in blocks]
+        posting_ranges = [self.impacts[self.block_postings[blk]:self.block_postings[blk + 1]] for blk in blocks]
+        gaps = decode_varints(np.concatenate(byte_ranges))
+        sizes = self.block_postings[blocks + 1] - self.block_postings[blocks]
+        block_of = np.repeat(np.arange(len(blocks)), sizes)
+        running = np.cumsum(gaps)
+        block_base = running[np.concatenate(([0], np.cumsum(sizes)[:-1]))]
+        docs = running - block_base[block_of] + self.block_first_doc[blocks][block_of]
+        return docs, np.concatenate(posting_ranges)
+
+    def search(self, query, k=10):
+        """Top-``k`` (rows, scores) for a free-text query, best first"""
+        term_ids = list(dict.fromkeys(self.term_ids[t] for t in tokenize(query) if t in self.term_ids))
+        if not term_ids or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        term_ids.sort(key=lambda t: -int(self.term_max_impact[t]))
+        remaining = sum(int(self.term_max_impact[t]) for t in term_ids)
+        scores = np.zeros(self.n_docs, dtype=np.int32)
+        seen = np.zeros(self.n_docs, dtype=bool)
+        candidates = None
+        threshold = 0
+
+        for term in term_ids:
+            remaining -= int(self.term_max_impact[term])
+            blocks = np.arange(self.term_blocks[term], self.term_blocks[term + 1])
+
+            if candidates is None:
+                docs, impacts = self._decode_blocks(blocks)
+                scores[docs] += impacts
+                seen[docs] = True
+                if remaining == 0:
+                    break
+                pool = np.flatnonzero(seen)
+                if len(pool) >= k:
+                    threshold = np.partition(scores[pool], len(pool) - k)[len(pool) - k]
+                    if threshold > remaining:
+                        # Unseen documents can no longer reach the top k, not even on a tie
+                        candidates = pool
+            else:
+                # Only decode blocks whose doc range overlaps a candidate
+                first = self.block_first_doc[blocks]
+                slot = np.searchsorted(first, candidates, side='right') - 1
+                hit = (slot >= 0) & (candidates <= self.block_last_doc[blocks][np.maximum(slot, 0)])
+                docs, impacts = self._decode_blocks(blocks[np.unique(slot[hit])])
+                keep = seen[docs]
+                scores[docs[keep]] += impacts[keep]
+                candidates = candidates[scores[candidates] + remaining >= threshold]
+
+        pool = np.flatnonzero(seen) if candidates is None else candidates
+        if len(pool) > k:
+            # Keep every document tied with the k-th score so ties go to the lowest doc id
+            kth = np.partition(scores[pool], len(pool) - k)[len(pool) - k]
+            pool = pool[scores[pool] >= kth]
+        order = np.lexsort((pool, -scores[pool]))[:k]
+        rows = pool[order]
+        return rows, (scores[rows] * self.scale).astype(np.float32)
@@ -1,22 +1,20 @@
 import os
-import pickle
 import pandas as pd
 import streamlit as st
-import requests
-import ast
-from collections import Counter, defaultdict
 import traceback
-import random
-import difflib
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from auth import sign_in, sign_up, get_name
-import firebase_admin
-from firebase_admin import credentials, firestore
-from admin_db import db,get_likes_from_db,save_likes_to_db
+from auth import sign_in, sign_up
+from admin_db import (get_cached_user_data, queue_user_update, record_feedback, flush_user_updates,
+                      user_cache_stats, user_write_stats)
+from feedback_log import LIKE, UNLIKE, CLEAR
+from user_feedback import UserFeedback, session_feedback
 import time
 from css import load_css  # Import custom CSS for styling
-import numpy as np
+from neighbors import NeighborIndex
+from scoring import content_scores, genre_masks, rank_scores
+from catalog import MovieCatalog
+from registry import get_model_registry, model_available
+from movie_search import get_movie_search, session_typeahead
+from posters import fetch_posters, poster_health
 
 # Firebase Init
 
@@ -25,46 +23,8 @@ DATA_DIR = "/Dataset"
 MOVIES_PATH = os.path.join(DATA_DIR, "tmdb_5000_movies.csv")
 CREDITS_PATH = os.path.join(DATA_DIR, "tmdb_5000_credits.csv")
 MODEL_DIR = "model"
-MOVIE_PKL = os.path.join(MODEL_DIR, "movie_list.pkl")
-SIMILARITY_PKL = os.path.join(MODEL_DIR, "similarity.pkl")
 
 # --- Helper Functions ---
-def fetch_poster(movie_id, size='w500'):
-    """Fetches poster URL from TMDB using movie_id with fallback and timeout handling."""
-    api_key = st.secrets.get("tmdb_api_key", "")
-    placeholder_base = "https://via.placeholder.com/500x750"
-
-    if not api_key:
-        return f"{placeholder_base}?text=No+API+Key"
-
-    try:
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={api_key}&language=en-US"
-        response = requests.get(url, timeout=5)
-        
-        if response.status_code != 200:
-            return f"{placeholder_base}?text=TMDB+Error+{response.status_code}"
-
-        data = response.json()
-        poster_path = data.get('poster_path')
-        
-        if not poster_path:
-            return f"{placeholder_base}?text=No+Poster"
-
-        return f"https://image.tmdb.org/t/p/{size}/{poster_path}"
-    
-    except requests.exceptions.Timeout:
-        return f"{placeholder_base}?text=Timeout"
-
-    except requests.exceptions.RequestException as e:
-        # Optional: log the error for debugging
-        print(f"[Poster Fetch Error] movie_id={movie_id}: {e}")
-        return f"{placeholder_base}?text=Fetch+Error"
-
-    except Exception as e:
-        print(f"[Unexpected Error] movie_id={movie_id}: {e}")
-        return f"{placeholder_base}?text=Unknown+Error"
-
-
 def get_popular_movies(movies, n=8):
     """Get popular movies based on available columns"""
     possible_columns = ['vote_average', 'popularity', 'vote_count', 'revenue', 'budget']
@@ -81,145 +41,90 @@ def get_popular_movies(movies, n=8):
     
     return movies.sample(n)
 
-def handle_like_toggle(movie_name, key_suffix=""):
-    if movie_name in st.session_state.liked_movies:
-        st.session_state.liked_movies.remove(movie_name)
+def handle_like_toggle(movie_id, movie_name, key_suffix=""):
+    feedback = st.session_state.feedback
+    if feedback.is_liked(movie_id):
+        kind = UNLIKE
         st.success(f"❤️ Removed '{movie_name}' from your likes!")
     else:
-        st.session_state.liked_movies.append(movie_name)
+        kind = LIKE
         st.success(f"💖 Added '{movie_name}' to your likes!")
-
-    st.write("🔄 Attempting to update Firebase...")
-    st.write("Current liked movies:", st.session_state.liked_movies)
-    st.write("User:", st.session_state.username)
+    feedback.apply(movie_id, kind)
 
     try:
-        print(f"[DEBUG] Writing likes for user {st.session_state.uid}: {st.session_state.liked_movies}")
-        result = db.collection('users').document(st.session_state.uid).set({
-            'liked_movies': st.session_state.liked_movies,
-            'preferences_set': bool(st.session_state.liked_movies),
-            'email': st.session_state.username  # Store email as a field
-        }, merge=True)
-        print("[DEBUG] Firestore write result:", result)
-        st.success("✅ Firebase updated successfully!")
+        # Written to Firebase in the background as one small event; the session already shows the change
+        record_feedback(st.session_state.uid, movie_id, kind)
+        queue_user_update(st.session_state.uid, {'email': st.session_state.username})  # Store email as a field
     except Exception as e:
         st.error(f"❌ Failed to save to database.")
         st.exception(e)
         traceback.print_exc()
 
 # Cache recommendations for better performance
-@st.cache_data(ttl=1800)  # Cache for 30 minutes
-def get_ultimate_recommendations(liked_movies, disliked_movies, movies, similarity, top_n=10, genre_boost=0.25):
+@st.cache_data(ttl=1800, hash_funcs={MovieCatalog: lambda c: c.version,
+                                      NeighborIndex: lambda n: n.version})  # Cache for 30 minutes
+def get_ultimate_recommendations(liked_ids, disliked_ids, catalog, similarity, top_n=10, genre_boost=0.25):
     """
     Ultimate hybrid movie recommendation:
     - Combines content-based similarity
     - Penalizes disliked movies
     - Boosts movies with similar genres to liked movies
     - Filters out disliked genres
+
+    Returns (movie_ids, scores) only; titles and posters are resolved by the
+    caller so the cached ranking never depends on TMDB.
     """
 
     # === Sanity Checks ===
-    if not liked_movies:
+    if not len(liked_ids):
         print("⚠️ No liked movies provided.")
-        return [], [], []
+        return [], []
     
     if similarity is None:
-        print("⚠️ Similarity matrix is None.")
-        return [], [], []
+        print("⚠️ Neighbor index is None.")
+        return [], []
     
-    if movies is None or movies.empty:
-        print("⚠️ Movies dataframe is empty or None.")
-        return [], [], []
+    if catalog is None or len(catalog) == 0:
+        print("⚠️ Movie catalog is empty or None.")
+        return [], []
     
-    if 'genres' not in movies.columns:
-        print("⚠️ 'genres' column not found in movies dataframe.")
-        return [], [], []
-
-    # === Helper: Safe movie title to index ===
-    def safe_index_lookup(title):
-        match = movies[movies['title'] == title]
-        return match.index[0] if not match.empty else None
+    if catalog.genre_matrix is None:
+        print("⚠️ Genre matrix not found in movie catalog.")
+        return [], []
 
-    liked_indices = list(filter(lambda x: x is not None, [safe_index_lookup(title) for title in liked_movies]))
-    disliked_indices = list(filter(lambda x: x is not None, [safe_index_lookup(title) for title in disliked_movies]))
+    liked_indices = catalog.rows_of_ids(liked_ids)
+    disliked_indices = catalog.rows_of_ids(disliked_ids)
 
-    if not liked_indices:
+    if not len(liked_indices):
         print("⚠️ No valid liked movie indices found.")
-        return [], [], []
+        return [], []
 
-    # === Content-Based Similarity Scoring ===
     try:
-        similarity_matrix = np.array(similarity)
-        content_scores = {}
-
-        for i, idx in enumerate(liked_indices):
-            weight = (len(liked_indices) - i) / len(liked_indices)  # newer likes carry more weight
-            scores = similarity_matrix[idx]
-
-            for j, score in enumerate(scores):
-                if j in liked_indices or j in disliked_indices:
-                    continue
-                content_scores[j] = content_scores.get(j, 0) + score * weight
-
-        # === Genre Extraction from liked/disliked movies ===
-        def extract_genres(title_list):
-            genres = []
-            for title in title_list:
-                match = movies[movies['title'] == title]
-                if not match.empty:
-                    raw = match.iloc[0]['genres']
-                    try:
-                        parsed = ast.literal_eval(raw) if isinstance(raw, str) else raw
-                        genres.extend([g['name'] for g in parsed if isinstance(g, dict) and 'name' in g])
-                    except:
-                        continue
-            return genres
-
-        liked_genres = extract_genres(liked_movies)
-        disliked_genres = set(extract_genres(disliked_movies))
-
-        genre_counter = Counter(liked_genres)
-        top_genres = set([g for g, _ in genre_counter.most_common(3)])
-
-        # === Final Score Calculation with Genre Boost ===
-        final_scores = {}
-        for idx, base_score in content_scores.items():
-            try:
-                raw = movies.iloc[idx]['genres']
-                parsed = ast.literal_eval(raw) if isinstance(raw, str) else raw
-                genre_list = [g['name'] for g in parsed if isinstance(g, dict) and 'name' in g]
-            except:
-                genre_list = []
-
-            # Filter out disliked genres
-            if any(g in disliked_genres for g in genre_list):
-                continue
+        # === Genre boost/filter masks from the multi-hot genre matrix ===
+        boost_mask, exclude_mask = genre_masks(catalog.genre_matrix, liked_indices, disliked_indices)
 
-            # Boost for matching top liked genres
-            if any(g in top_genres for g in genre_list):
-                base_score *= (1 + genre_boost)
+        scores = content_scores(similarity, liked_indices)
 
-            final_scores[idx] = base_score
+        # === Vectorized Scoring with Genre Boost and Filtering ===
+        indices, final_scores = rank_scores(
+            scores, liked_indices, disliked_indices,
+            boost_mask=boost_mask, exclude_mask=exclude_mask,
+            genre_boost=genre_boost, top_n=top_n
+        )
 
-        if not final_scores:
+        if len(indices) == 0:
             print("⚠️ No final recommendations could be computed.")
-            return [], [], []
+            return [], []
 
         # === Top-N Recommendations ===
-        ranked = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)[:top_n]
-        indices = [i for i, _ in ranked]
-
-        names = [movies.iloc[i]['title'] for i in indices]
-        posters = [fetch_poster(movies.iloc[i]['movie_id']) for i in indices]
-        sources = [f"Hybrid (Score: {round(final_scores[i], 3)})" for i in indices]
-
-        return names, posters, sources
+        movie_ids = [catalog.movie_id(i) for i in indices]
+        return movie_ids, [float(score) for score in final_scores]
         
     except Exception as e:
         print(f"⚠️ Error in recommendation calculation: {str(e)}")
-        return [], [], []
+        return [], []
 
-def display_movies_grid(names, posters, key_prefix="", allow_like=True, columns=4, sources=None, show_explanation=False):
+def display_movies_grid(names, posters, movie_ids, key_prefix="", allow_like=True, columns=4, sources=None, show_explanation=False):
     """Enhanced movie grid display with feedback options"""
     if not names:
         return
@@ -227,7 +132,8 @@ def display_movies_grid(names, posters, key_prefix="", allow_like=True, columns=
     num_movies = len(names)
     cols = st.columns(min(columns, num_movies))
     
-    for idx, (name, poster) in enumerate(zip(names, posters)):
+    feedback = st.session_state.feedback
+    for idx, (name, poster, movie_id) in enumerate(zip(names, posters, movie_ids)):
         with cols[idx % columns]:
             with st.container():
                 st.image(poster, use_container_width=True)
@@ -248,100 +154,23 @@ def display_movies_grid(names, posters, key_prefix="", allow_like=True, columns=
                     # Like/Dislike buttons
                     col_like, col_dislike = st.columns(2)
                     with col_like:
-                        is_liked = name in st.session_state.liked_movies
+                        is_liked = feedback.is_liked(movie_id)
                         button_text = "💖 Liked" if is_liked else "🤍 Like"
                         if st.button(button_text, key=f"{key_prefix}_like_{idx}", use_container_width=True):
-                            if handle_movie_feedback(name, 'like'):
+                            if handle_movie_feedback(movie_id, 'like'):
                                 st.success("Thanks for your feedback!")
                                 time.sleep(0.1)
                                 st.rerun()
                     
                     with col_dislike:
-                        is_disliked = name in st.session_state.disliked_movies
+                        is_disliked = feedback.is_disliked(movie_id)
                         button_text = "👎 Disliked" if is_disliked else "👎 Dislike"
                         if st.button(button_text, key=f"{key_prefix}_dislike_{idx}", use_container_width=True):
-                            if handle_movie_feedback(name, 'dislike'):
+                            if handle_movie_feedback(movie_id, 'dislike'):
                                 st.info("We'll avoid similar movies!")
                                 time.sleep(0.1)
                                 st.rerun()
 
-# Cache movie suggestions for better performance
-@st.cache_data(ttl=3600)
-def get_movie_suggestions(query, movies, limit=10):
-    """Get comprehensive movie suggestions for autocomplete"""
-    if not query or len(query) < 2:
-        return []
-    
-    # Create lowercase title column for faster searching
-    if 'title_lower' not in movies.columns:
-        movies['title_lower'] = movies['title'].str.lower()
-    
-    query_lower = query.lower()
-    suggestions = []
-    
-    # 1. Exact matches (case insensitive)
-    exact_matches = movies[movies['title_lower'] == query_lower]['title'].tolist()
-    suggestions.extend(exact_matches)
-    
-    # 2. Starts with matches
-    starts_with = movies[movies['title_lower'].str.startswith(query_lower)]['title'].tolist()
-    suggestions.extend([m for m in starts_with if m not in suggestions])
-    
-    # 3. Contains matches
-    contains = movies[movies['title_lower'].str.contains(query_lower, na=False)]['title'].tolist()
-    suggestions.extend([m for m in contains if m not in suggestions])
-    
-    # 4. Fuzzy matches for better suggestions
-    if len(suggestions) < limit:
-        from difflib import get_close_matches
-        all_titles = movies['title'].tolist()
-        fuzzy_matches = get_close_matches(query_lower, [t.lower() for t in all_titles], n=5, cutoff=0.6)
-        fuzzy_matches = [movies[movies['title_lower'] == m]['title'].iloc[0] for m in fuzzy_matches if m]
-        suggestions.extend([m for m in fuzzy_matches if m not in suggestions])
-    
-    return suggestions[:limit]
-
-def search_movies_improved(query, movies):
-    """Enhanced movie search with better matching"""
-    if not query or len(query.strip()) < 2:
-        return pd.DataFrame()
-    
-    query = query.strip()
-    
-    # Create lowercase title column if it doesn't exist
-    if 'title_lower' not in movies.columns:
-        movies['title_lower'] = movies['title'].str.lower()
-    
-    # 1. Exact matches
-    exact_matches = movies[movies['title_lower'] == query.lower()]
-    
-    # 2. Starts with matches
-    starts_with = movies[movies['title_lower'].str.startswith(query.lower())]
-    starts_with = starts_with[~starts_with['title'].isin(exact_matches['title'])]
-    
-    # 3. Contains matches
-    contains = movies[movies['title_lower'].str.contains(query.lower(), na=False)]
-    contains = contains[~contains['title'].isin(pd.concat([exact_matches, starts_with])['title'])]
-    
-    # 4. Fuzzy matches if we have few results
-    if len(exact_matches) + len(starts_with) + len(contains) < 10:
-        from difflib import get_close_matches
-        all_titles = movies['title'].tolist()
-        fuzzy_matches = get_close_matches(query.lower(), [t.lower() for t in all_titles], n=10, cutoff=0.6)
-        fuzzy_matches = movies[movies['title_lower'].isin(fuzzy_matches)]
-        fuzzy_matches = fuzzy_matches[~fuzzy_matches['title'].isin(pd.concat([exact_matches, starts_with, contains])['title'])]
-        
-        # Combine all results
-        final_results = pd.concat([exact_matches, starts_with, contains, fuzzy_matches], ignore_index=True)
-    else:
-        final_results = pd.concat([exact_matches, starts_with, contains], ignore_index=True)
-    
-    # Remove duplicates and limit results
-    if not final_results.empty:
-        final_results = final_results.drop_duplicates(subset=['title']).head(20)
-    
-    return final_results
-
 def debug_dataframe_columns(df, name="DataFrame"):
     """Debug helper to show dataframe columns"""
     st.expander(f"🔍 Debug: {name} Columns", expanded=False).write({
@@ -350,34 +179,15 @@ def debug_dataframe_columns(df, name="DataFrame"):
         "Sample Data": df.head(2).to_dict() if not df.empty else "No data"
     })
 
-def handle_movie_feedback(movie_name, feedback_type):
+def handle_movie_feedback(movie_id, feedback_type):
     """Handle movie feedback (like/dislike) and update Firebase"""
     try:
         # Update session state
-        if feedback_type == 'like':
-            if movie_name in st.session_state.disliked_movies:
-                st.session_state.disliked_movies.remove(movie_name)
-            if movie_name not in st.session_state.liked_movies:
-                st.session_state.liked_movies.append(movie_name)
-        else:  # dislike
-            if movie_name in st.session_state.liked_movies:
-                st.session_state.liked_movies.remove(movie_name)
-            if movie_name not in st.session_state.disliked_movies:
-                st.session_state.disliked_movies.append(movie_name)
+        movie_id = int(movie_id)
+        st.session_state.feedback.apply(movie_id, feedback_type)
         
-        # Update feedback in session state
-        st.session_state.movie_feedback[movie_name] = {
-            'type': feedback_type,
-            'timestamp': time.time()
-        }
-        
-        # Update Firebase
-        db.collection('users').document(st.session_state.uid).set({
-            'liked_movies': st.session_state.liked_movies,
-            'disliked_movies': st.session_state.disliked_movies,
-            'movie_feedback': st.session_state.movie_feedback,
-            'preferences_set': bool(st.session_state.liked_movies or st.session_state.disliked_movies)
-        }, merge=True)
+        # Append one feedback event; it is coalesced with other clicks and flushed in the background
+        record_feedback(st.session_state.uid, movie_id, feedback_type)
         
         return True
     except Exception as e:
@@ -419,9 +229,7 @@ def main():
             'logged_in': False,
             'username': '',
             'uid': '',
-            'liked_movies': [],
-            'disliked_movies': [],  # Add disliked movies tracking
-            'movie_feedback': {},   # Add detailed feedback tracking
+            'feedback': None,  # UserFeedback, loaded once the catalog is available
             'preferences_set': False,
             'current_tab': 'Recommendations',  # Set default tab
             'first_login': True,
@@ -488,11 +296,10 @@ def main():
                                         
                                         # Load user data using UID
                                         try:
-                                            user_data = db.collection('users').document(st.session_state.uid).get().to_dict() or {}
-                                            st.session_state.liked_movies = user_data.get('liked_movies', [])
-                                            st.session_state.disliked_movies = user_data.get('disliked_movies', [])
-                                            st.session_state.movie_feedback = user_data.get('movie_feedback', {})
-                                            st.session_state.preferences_set = bool(st.session_state.liked_movies or st.session_state.disliked_movies)
+                                            user_data = get_cached_user_data(st.session_state.uid) or {}
+                                            # Likes are turned into a UserFeedback once the catalog is loaded
+                                            st.session_state.feedback = None
+                                            st.session_state.preferences_set = bool(user_data.get('preferences_set'))
                                             st.session_state.first_login = False
                                         except Exception as e:
                                             st.warning("Could not load user preferences")
@@ -557,9 +364,7 @@ def main():
                                         st.session_state.logged_in = True
                                         st.session_state.username = email
                                         st.session_state.uid = res.get('uid')  # Store UID
-                                        st.session_state.liked_movies = []
-                                        st.session_state.disliked_movies = []
-                                        st.session_state.movie_feedback = {}
+                                        st.session_state.feedback = UserFeedback()
                                         st.session_state.preferences_set = False
                                         st.session_state.first_login = True
                                         
@@ -589,99 +394,40 @@ def main():
         # Stop execution here if not logged in
         return
 
-    # Initialize model loading state
-    if 'models_loaded' not in st.session_state:
-        st.session_state.models_loaded = False
-        st.session_state.movies = None
-        st.session_state.similarity = None
-
-    # Load model files with caching
-    @st.cache_data(ttl=3600)  # Cache for 1 hour
-    def load_movies():
-        """Load and validate movie data"""
-        try:
-            if not os.path.exists(MOVIE_PKL):
-                st.error(f"❌ Movie data file not found at {MOVIE_PKL}")
-                return None
-                
-            movies = pickle.load(open(MOVIE_PKL, 'rb'))
-            
-            # Validate that we got a DataFrame
-            if not isinstance(movies, pd.DataFrame):
-                st.error("❌ Invalid movie data format. Expected DataFrame.")
-                return None
-                
-            # Ensure required columns exist
-            required_columns = ['movie_id', 'title', 'genres']
-            missing_columns = [col for col in required_columns if col not in movies.columns]
-            
-            if missing_columns:
-                st.error(f"❌ Missing required columns in movie data: {', '.join(missing_columns)}")
-                return None
-                
-            # Validate data types
-            if not pd.api.types.is_numeric_dtype(movies['movie_id']):
-                st.error("❌ 'movie_id' column must be numeric")
-                return None
-                
-            # Convert genres to string if it's not already
-            if 'genres' in movies.columns:
-                movies['genres'] = movies['genres'].apply(lambda x: str(x) if not isinstance(x, str) else x)
-            
-            # Add title_lower column for searching
-            movies['title_lower'] = movies['title'].str.lower()
-            
-            return movies
-            
-        except Exception as e:
-            st.error(f"❌ Error loading movie data: {str(e)}")
-            return None
-
-    @st.cache_data(ttl=3600)  # Cache for 1 hour
-    def load_similarity():
-        try:
-            return pickle.load(open(SIMILARITY_PKL, 'rb'))
-        except Exception as e:
-            st.error(f"Error loading similarity data: {e}")
-            return None
-
     # Check if model files exist
-    if not os.path.exists(MOVIE_PKL) or not os.path.exists(SIMILARITY_PKL):
+    if not model_available(MODEL_DIR):
         st.error("🚨 Model files not found. Please build the recommendation model first.")
         return
 
-    # Load models only when needed
+    # Load the shared model registry (once per process, not per session)
     try:
-        if not st.session_state.models_loaded:
-            with st.spinner("🚀 Loading movie database... This may take a moment."):
-                movies = load_movies()
-                similarity = load_similarity()
-                
-                # Validate loaded data
-                if movies is None or similarity is None:
-                    st.error("❌ Failed to load required data. Please check if the model files exist and are valid.")
-                    return
-                
-                st.session_state.movies = movies
-                st.session_state.similarity = similarity
-                st.session_state.models_loaded = True
-        else:
-            movies = st.session_state.movies
-            similarity = st.session_state.similarity
-            
-            # Validate session state data
-            if movies is None or similarity is None:
-                st.error("❌ Session data is invalid. Please refresh the page.")
-                # Reset session state
-                st.session_state.models_loaded = False
-                st.session_state.movies = None
-                st.session_state.similarity = None
-                st.rerun()
-                return
+        with st.spinner("🚀 Loading movie database... This may take a moment."):
+            registry = get_model_registry(MODEL_DIR)
+        movies = registry.movies
+        similarity = registry.neighbors
+        catalog = registry.catalog
+        search = get_movie_search(registry.version, catalog)
+        feedback = session_feedback(catalog)
+        st.session_state.models_loaded = True
             
         with st.sidebar:
-            if st.checkbox("🔧 Debug Mode"):
+            if st.checkbox("🔧 Debug Mode", key="show_debug"):
                 debug_dataframe_columns(movies, "Movies")
+                st.expander("🧠 Debug: Model Registry", expanded=False).write({
+                    "Source": registry.source,
+                    "Version": registry.version,
+                    "Memory (MB)": {k: round(v / 1e6, 2) for k, v in registry.memory_usage().items()},
+                })
+                st.expander("🔎 Debug: Search", expanded=False).write({
+                    **search.stats(),
+                    "Memory (MB)": {k: round(v / 1e6, 2) for k, v in search.memory_usage().items()},
+                })
+                st.expander("🖼️ Debug: Poster Service", expanded=False).write(poster_health())
+                st.expander("👤 Debug: User Data", expanded=False).write({
+                    "Session Feedback (bytes)": feedback.nbytes,
+                    "Cache": user_cache_stats(),
+                    "Queued Writes": user_write_stats(),
+                })
                 
     except Exception as e:
         st.error(f"Error loading model files: {e}")
@@ -691,7 +437,7 @@ def main():
     st.markdown(f"""
     <div class="movie-header">
         <h1>🎬 Welcome back, {st.session_state.username.split('@')[0].title()}!</h1>
-        <p>You've liked {len(st.session_state.liked_movies)} movies so far</p>
+        <p>You've liked {len(feedback.liked)} movies so far</p>
     </div>
     """, unsafe_allow_html=True)
 
@@ -699,13 +445,14 @@ def main():
     with st.sidebar:
         st.markdown("### Account")
         if st.button("🚪 Logout", use_container_width=True):
+            flush_user_updates(st.session_state.get('uid'))
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
         
         st.markdown("### Quick Stats")
-        st.metric("Liked Movies", len(st.session_state.liked_movies))
-        st.metric("Disliked Movies", len(st.session_state.disliked_movies))
+        st.metric("Liked Movies", len(feedback.liked))
+        st.metric("Disliked Movies", len(feedback.disliked))
         if movies is not None:  # Add check before accessing movies
             st.metric("Available Movies", len(movies))
 
@@ -731,7 +478,7 @@ def main():
                 search_query = st.text_input(
                     "🔎 Search for movies...", 
                     value=st.session_state.get('search_query', ''),
-                    placeholder="Type movie name (e.g., Avatar, Inception, Titanic...)",
+                    placeholder="Type a title, actor, director or plot words (e.g., Avatar, nolan space...)",
                     key="movie_search_input"
                 )
             
@@ -745,7 +492,7 @@ def main():
 
             # Auto-suggestions
             if search_query and len(search_query) >= 2:
-                suggestions = get_movie_suggestions(search_query, movies, limit=10)
+                suggestions = search.suggest(search_query, limit=10, typeahead=session_typeahead(search))
                 if suggestions and search_query != st.session_state.get('selected_suggestion', ''):
                     st.markdown("**💡 Suggestions:**")
                     cols = st.columns(min(5, len(suggestions)))
@@ -760,7 +507,8 @@ def main():
             if search_query and search_query.strip():
                 if search_query != st.session_state.get('search_query', ''):
                     st.session_state.search_query = search_query
-                    st.session_state.search_results = search_movies_improved(search_query, movies)
+                    rows = search.search(search_query, typeahead=session_typeahead(search))
+                    st.session_state.search_results = movies.iloc[rows].reset_index(drop=True)
                     st.session_state.selected_suggestion = ""
                 
                 search_results = st.session_state.get('search_results', pd.DataFrame())
@@ -774,10 +522,11 @@ def main():
                 result_count = len(search_results)
                 st.success(f"🎯 Found {result_count} movie{'s' if result_count != 1 else ''} matching '{search_query}'")
                 
-                posters = [fetch_poster(mid) for mid in search_results['movie_id']]
+                posters = fetch_posters(search_results['movie_id'], known_paths=catalog.poster_path_of_id)
                 display_movies_grid(
                     search_results['title'].tolist(), 
                     posters, 
+                    search_results['movie_id'].tolist(),
                     key_prefix="search",
                     columns=4
                 )
@@ -805,10 +554,11 @@ def main():
             # Display random movies
             if isinstance(st.session_state.random_movies, pd.DataFrame) and not st.session_state.random_movies.empty:
                 try:
-                    posters = [fetch_poster(mid) for mid in st.session_state.random_movies['movie_id']]
+                    posters = fetch_posters(st.session_state.random_movies['movie_id'], known_paths=catalog.poster_path_of_id)
                     display_movies_grid(
                         st.session_state.random_movies['title'].tolist(), 
                         posters, 
+                        st.session_state.random_movies['movie_id'].tolist(),
                         key_prefix="random",
                         columns=4
                     )
@@ -822,9 +572,8 @@ def main():
         st.session_state.current_tab = 1
         st.markdown("### 🎯 Your Personal Recommendations")
         
-        liked = st.session_state.get('liked_movies', [])
-        disliked = st.session_state.get('disliked_movies', [])
-        feedback_count = len(liked) + len(disliked)
+        liked, disliked = feedback.liked, feedback.disliked
+        feedback_count = len(feedback)
 
         # === Show Feedback Summary inside EXISTING Sidebar ===
         with st.sidebar.expander("🧠 Recommendation Feedback Summary", expanded=True):
@@ -839,16 +588,17 @@ def main():
                 st.warning("📈 Still Learning — Keep rating to improve recommendations!")
 
         # === CASE: No feedback yet ===
-        if not liked and not disliked:
+        if not feedback_count:
             st.info("💡 **Get Started:** Like or dislike some movies to get personalized recommendations!")
             
             st.markdown("#### 🌟 Popular Movies to Get You Started")
             try:
                 popular_movies = get_popular_movies(movies, 8)
-                posters = [fetch_poster(mid) for mid in popular_movies['movie_id']]
+                posters = fetch_posters(popular_movies['movie_id'], known_paths=catalog.poster_path_of_id)
                 display_movies_grid(
                     popular_movies['title'].tolist(), 
                     posters, 
+                    popular_movies['movie_id'].tolist(),
                     key_prefix="popular",
                     columns=4
                 )
@@ -878,20 +628,31 @@ def main():
                             st.write(f"Liked Movies: {len(liked)}")
                             st.write(f"Disliked Movies: {len(disliked)}")
                             st.write(f"Movies DataFrame Shape: {movies.shape}")
-                            st.write(f"Similarity Matrix Shape: {similarity.shape if similarity is not None else 'None'}")
+                            st.write(f"Neighbor Index Shape: {similarity.shape if similarity is not None else 'None'}")
                             st.write(f"Movies Columns: {movies.columns.tolist()}")
 
-                        names, posters, sources = get_ultimate_recommendations(
-                            liked_movies=liked,
-                            disliked_movies=disliked,
-                            movies=movies,
+                        ranking_start = time.perf_counter()
+                        rec_ids, rec_scores = get_ultimate_recommendations(
+                            liked_ids=liked,
+                            disliked_ids=disliked,
+                            catalog=catalog,
                             similarity=similarity,
                             top_n=10
                         )
+                        ranking_ms = (time.perf_counter() - ranking_start) * 1000
                     except Exception as e:
                         st.error("🚫 Recommendation engine failed.")
                         st.exception(e)
-                        names, posters, sources = [], [], []
+                        rec_ids, rec_scores = [], []
+
+                # === Posters are a separate, independently cached stage ===
+                names = [catalog.title(catalog.row_of_id(mid)) for mid in rec_ids]
+                sources = [f"Hybrid (Score: {round(score, 3)})" for score in rec_scores]
+                poster_start = time.perf_counter()
+                posters = fetch_posters(rec_ids, known_paths=catalog.poster_path_of_id)
+                # debug_mode is always on after the first run; timings follow the sidebar toggle
+                if rec_ids and st.session_state.get('show_debug', False):
+                    st.caption(f"⏱️ Ranking: {ranking_ms:.1f} ms · Posters: {(time.perf_counter() - poster_start) * 1000:.1f} ms")
 
                 if names:
                     with st.expander("🧠 How we chose these for you", expanded=True):
@@ -908,6 +669,7 @@ def main():
                     display_movies_grid(
                         names, 
                         posters, 
+                        rec_ids,
                         key_prefix="recommend", 
                         allow_like=True, 
                         columns=4,
@@ -927,10 +689,11 @@ def main():
                     st.markdown("#### 🎲 Popular fallback movies you might enjoy:")
                     try:
                         fallback_movies = get_popular_movies(movies, 4)
-                        fallback_posters = [fetch_poster(mid) for mid in fallback_movies['movie_id']]
+                        fallback_posters = fetch_posters(fallback_movies['movie_id'], known_paths=catalog.poster_path_of_id)
                         display_movies_grid(
                             fallback_movies['title'].tolist(),
                             fallback_posters,
+                            fallback_movies['movie_id'].tolist(),
                             key_prefix="fallback",
                             columns=4
                         )
@@ -943,56 +706,40 @@ def main():
         st.session_state.current_tab = 2
         st.markdown("### ❤️ Your Movie Collection")
         
-        liked = st.session_state.liked_movies
-        if liked:
+        liked_rows, _ = feedback.rows(catalog)
+        if len(liked_rows):
             col1, col2 = st.columns([2, 1])
             with col1:
-                st.markdown(f"**You have {len(liked)} liked movies**")
+                st.markdown(f"**You have {len(liked_rows)} liked movies**")
             with col2:
                 if st.button("🗑️ Clear All Likes", use_container_width=True):
-                    st.session_state.liked_movies = []
-                    st.session_state.disliked_movies = []
-                    st.session_state.movie_feedback = {}
+                    feedback.apply(None, CLEAR)
                     st.session_state.preferences_set = False
                     try:
-                        db.collection('users').document(st.session_state.uid).set({
-                            'liked_movies': [],
-                            'disliked_movies': [],
-                            'movie_feedback': {},
-                            'preferences_set': False,
-                            'email': st.session_state.username
-                        }, merge=True)
+                        record_feedback(st.session_state.uid, None, CLEAR)
+                        queue_user_update(st.session_state.uid, {'email': st.session_state.username})
                         st.success("🧹 All likes cleared!")
                         time.sleep(1)
                         st.rerun()
                     except Exception as e:
                         st.error(f"Failed to clear likes: {e}")
 
-            # Display liked movies
-            posters = []
-            for movie in liked:
-                try:
-                    movie_data = movies[movies['title'] == movie]
-                    if not movie_data.empty:
-                        movie_id = movie_data.iloc[0]['movie_id']
-                        poster = fetch_poster(movie_id)
-                        posters.append(poster)
-                    else:
-                        posters.append("https://via.placeholder.com/500x750?text=No+Image")
-                except:
-                    posters.append("https://via.placeholder.com/500x750?text=No+Image")
+            # Display liked movies (rows index the catalog directly, no title lookups)
+            liked_ids = catalog.movie_ids[liked_rows].tolist()
+            posters = fetch_posters(liked_ids, known_paths=catalog.poster_path_of_id)
             
-            display_movies_grid(liked, posters, key_prefix="liked", columns=4)
+            display_movies_grid(catalog.titles[liked_rows].tolist(), posters, liked_ids, key_prefix="liked", columns=4)
         else:
             st.info("💔 Your movie collection is empty!")
             st.markdown("Go to the **Discover** tab to start building your collection by liking movies you enjoy.")
             
             st.markdown("#### 🔥 Trending Movies")
             trending = movies.sample(4)
-            posters = [fetch_poster(mid) for mid in trending['movie_id']]
+            posters = fetch_posters(trending['movie_id'], known_paths=catalog.poster_path_of_id)
             display_movies_grid(
                 trending['title'].tolist(), 
                 posters, 
+                trending['movie_id'].tolist(),
                 key_prefix="trending_suggestions",
                 columns=4
             )
@@ -0,0 +1,94 @@
+import numpy as np
+import streamlit as st
+from admin_db import get_cached_user_data, migrate_user_feedback
+from feedback_log import LIKE, DISLIKE, UNLIKE, CLEAR, is_migrated
+
+# Title lists of documents written before feedback was keyed by id
+LEGACY_TITLE_FIELDS = ('liked_movies', 'disliked_movies')
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def _unique_ids(ids):
+    """int32 array of ``ids`` with duplicates dropped, first occurrence kept"""
+    return np.fromiter(dict.fromkeys(int(i) for i in ids), dtype=np.int32)
+
+
+class UserFeedback:
+    """One user's likes and dislikes as arrays of TMDB movie ids.
+
+    Ids are stable across model versions and unambiguous where titles are
+    duplicated; ``rows`` maps them onto a catalog with one vectorized lookup.
+    Liked ids keep the order the movies were liked in.
+    """
+
+    def __init__(self, liked=(), disliked=(), unmatched=None):
+        self.liked = _unique_ids(liked) if len(liked) else _EMPTY
+        self.disliked = _unique_ids(disliked) if len(disliked) else _EMPTY
+        # Legacy titles the catalog has no movie for, as {field: titles}
+        self.unmatched = unmatched or {}
+
+    @classmethod
+    def from_document(cls, doc, catalog):
+        """Feedback from a user document; title lists from older documents are mapped to ids"""
+        doc = doc or {}
+        liked = list(doc.get('liked_ids') or [])
+        disliked = list(doc.get('disliked_ids') or [])
+        unmatched = {}
+        if not is_migrated(doc):
+            titles = {field: list(doc.get(field) or []) for field in LEGACY_TITLE_FIELDS}
+            liked = catalog.ids_of_titles(titles['liked_movies']) + liked
+            disliked = catalog.ids_of_titles(titles['disliked_movies']) + disliked
+            for field, field_titles in titles.items():
+                missing = [title for title in field_titles if catalog.row_of(title) is None]
+                if missing:
+                    unmatched[field] = missing
+        return cls(liked, disliked, unmatched)
+
+    def __len__(self):
+        return len(self.liked) + len(self.disliked)
+
+    def is_liked(self, movie_id):
+        return bool((self.liked == movie_id).any())
+
+    def is_disliked(self, movie_id):
+        return bool((self.disliked == movie_id).any())
+
+    def apply(self, movie_id, kind):
+        """Apply a feedback event the same way feedback_log.apply_event does"""
+        if kind == CLEAR:
+            self.liked, self.disliked = _EMPTY, _EMPTY
+        elif kind == LIKE:
+            self.disliked = self.disliked[self.disliked != movie_id]
+            if not self.is_liked(movie_id):
+                self.liked = np.append(self.liked, np.int32(movie_id))
+        elif kind == DISLIKE:
+            self.liked = self.liked[self.liked != movie_id]
+            if not self.is_disliked(movie_id):
+                self.disliked = np.append(self.disliked, np.int32(movie_id))
+        elif kind == UNLIKE:
+            self.liked = self.liked[self.liked != movie_id]
+
+    def rows(self, catalog):
+        """(liked_rows, disliked_rows) of the movies present in ``catalog``"""
+        return catalog.rows_of_ids(self.liked), catalog.rows_of_ids(self.disliked)
+
+    def to_fields(self):
+        return {'liked_ids': self.liked.tolist(), 'disliked_ids': self.disliked.tolist(),
+                'preferences_set': bool(len(self))}
+
+    @property
+    def nbytes(self):
+        return self.liked.nbytes + self.disliked.nbytes
+
+
+def session_feedback(catalog):
+    """This session's UserFeedback, loaded (and migrated off titles if needed) on first use"""
+    feedback = st.session_state.get('feedback')
+    if feedback is None:
+        uid = st.session_state.get('uid')
+        doc = get_cached_user_data(uid) if uid else None
+        feedback = st.session_state['feedback'] = UserFeedback.from_document(doc, catalog)
+        if doc and not is_migrated(doc):
+            migrate_user_feedback(uid, feedback.to_fields(), feedback.unmatched)
+    return feedback
@@ -0,0 +1,142 @@
+import copy
+import threading
+import time
+
+DEFAULT_FLUSH_INTERVAL = 2.0  # seconds between background flushes
+DEFAULT_MAX_BACKOFF = 60.0
+
+
+def _replace_fields(target, fields):
+    target.update(copy.deepcopy(fields))
+    return target
+
+
+class WriteBehindQueue:
+    """Coalesce per-key field updates and write them from a background thread.
+
+    ``enqueue`` returns immediately. Updates for the same key are merged
+    (with ``merge(pending, fields)``, later fields winning), so a burst of
+    clicks becomes one write per flush. A failed write is retried with
+    exponential backoff, merged under any updates queued since; fields
+    that are queued or still being written can be read back with
+    ``pending`` for read-your-writes.
+    """
+
+    def __init__(self, writer, interval=DEFAULT_FLUSH_INTERVAL, max_backoff=DEFAULT_MAX_BACKOFF,
+                 merge=_replace_fields, name="write-behind"):
+        self.writer = writer
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.merge = merge
+        self.name = name
+        self._pending = {}
+        self._inflight = {}  # taken off _pending, writer not yet returned
+        self._retry_at = {}
+        self._attempts = {}
+        self._generations = {}  # successful writes per key
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.enqueued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failures = 0
+
+    def enqueue(self, key, fields):
+        with self._lock:
+            if key in self._pending:
+                self.merge(self._pending[key], fields)
+                self.coalesced += 1
+            else:
+                self._pending[key] = self.merge({}, fields)
+            self.enqueued += 1
+        self._ensure_thread()
+
+    def pending(self, key):
+        """Fields queued or in flight for ``key`` but not yet written (a copy), or None"""
+        with self._lock:
+            inflight, queued = self._inflight.get(key), self._pending.get(key)
+            if inflight is None:
+                return copy.deepcopy(queued) if queued is not None else None
+            fields = copy.deepcopy(inflight)
+            return self.merge(fields, queued) if queued is not None else fields
+
+    def generation(self, key):
+        """Count of successful writes for ``key``; a reader that sees it change raced a write"""
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def flush(self, key=None):
+        """Ask the background thread to write ``key`` (or everything) now, without waiting"""
+        with self._lock:
+            if key is None:
+                self._retry_at.clear()
+            else:
+                self._retry_at.pop(key, None)
+        self._wake.set()
+
+    def drain(self, key=None):
+        """Write ``key``'s (or everything) pending on the calling thread; returns the keys still failing"""
+        self.flush(key)
+        self._write_due(key)
+        with self._lock:
+            return [k for k in self._pending if key is None or k == key]
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._write_due()
+
+    def _write_due(self, only=None):
+        # One flusher at a time, so writes for a key are never reordered
+        with self._flush_lock:
+            now = time.monotonic()
+            with self._lock:
+                due = [key for key in self._pending
+                       if (only is None or key == only) and self._retry_at.get(key, 0) <= now]
+                batch = {key: self._pending.pop(key) for key in due}
+                self._inflight.update(batch)
+
+            for key, fields in batch.items():
+                try:
+                    self.writer(key, fields)
+                except Exception as e:
+                    with self._lock:
+                        del self._inflight[key]
+                        attempts = self._attempts[key] = self._attempts.get(key, 0) + 1
+                        newer = self._pending.get(key)
+                        self._pending[key] = self.merge(fields, newer) if newer is not None else fields
+                        backoff = min(self.max_backoff, self.interval * 2 ** attempts)
+                        self._retry_at[key] = time.monotonic() + backoff
+                        self.failures += 1
+                    print(f"[WARN] {self.name}: write for {key} failed (attempt {attempts}), "
+                          f"retrying in {backoff:.1f}s: {e}")
+                else:
+                    with self._lock:
+                        del self._inflight[key]
+                        self._generations[key] = self._generations.get(key, 0) + 1
+                        self._attempts.pop(key, None)
+                        self._retry_at.pop(key, None)
+                        self.written += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'in_flight': len(self._inflight),
+                'retrying': len(self._attempts),
+                'enqueued': self.enqueued,
+                'coalesced': self.coalesced,
+                'written': self.written,
+                'failures': self.failures,
+            }